@@ -1,17 +1,38 @@
-from flask import Flask, redirect, url_for, render_template, request, flash, session
+from flask import Flask, redirect, url_for, render_template, request, flash, session, jsonify, has_request_context, send_from_directory, g
+from flask import before_render_template, template_rendered
+from markupsafe import Markup, escape
 from flask_sqlalchemy import SQLAlchemy
 from datetime import timezone, timedelta, datetime
 from flask_login import UserMixin, login_user, LoginManager, login_required, logout_user, current_user
 from flask_wtf import FlaskForm
+from flask_wtf.csrf import generate_csrf
 from wtforms import StringField, PasswordField, SubmitField
 from wtforms.validators import ValidationError, Length, InputRequired, DataRequired
 from flask_bcrypt import Bcrypt
-import cloudinary
-import cloudinary.uploader
 from werkzeug.utils import secure_filename
-from sendgrid import SendGridAPIClient
-from sendgrid.helpers.mail import Mail
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.orm import object_session
+from sqlalchemy.pool import NullPool, QueuePool
+import base64
+import json
+import click
 import os
+import threading
+import time
+import uuid
+import re
+import hashlib
+import hmac
+import math
+import random
+import gzip
+import mimetypes
+import tempfile
+from collections import deque
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -19,27 +40,49 @@ load_dotenv()
 
 app = Flask(__name__, static_folder='../static', template_folder='../templates')
 
-print(f" SENDGRID_API_KEY in environment: {bool(os.environ.get('SENDGRID_API_KEY'))}")
-if os.environ.get('SENDGRID_API_KEY'):
-    key = os.environ.get('SENDGRID_API_KEY')
-    print(f" API Key starts with: {key[:10]}...")
-    print(f" API Key length: {len(key)}")
-else:
-    print("SENDGRID_API_KEY not found in environment variables!")
+
+# Deployment target: a Vercel function is frozen as soon as it has responded,
+# so work that would run on background threads elsewhere has to run inline
+def database_deployment_target():
+    """server for long-running gunicorn workers, serverless for Vercel functions"""
+    if os.environ.get('DB_DEPLOYMENT_TARGET'):
+        return os.environ['DB_DEPLOYMENT_TARGET']
+    return 'serverless' if os.environ.get('VERCEL') else 'server'
+
 
 app.config['SENDGRID_API_KEY'] = os.environ.get('SENDGRID_API_KEY')
 app.config['SENDGRID_FROM_EMAIL'] = os.environ.get('SENDGRID_FROM_EMAIL')
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'tegurasecretkey')
 SENDGRID_API_KEY = app.config['SENDGRID_API_KEY']
 SENDGRID_FROM_EMAIL = app.config['SENDGRID_FROM_EMAIL']
-# Cloudinary Configuration
-cloudinary.config(
-    cloud_name=os.environ.get('CLOUDINARY_CLOUD_NAME'),
-    api_key=os.environ.get('CLOUDINARY_API_KEY'),
-    api_secret=os.environ.get('CLOUDINARY_API_SECRET')
-)
 
-print(f"✅ Cloudinary configured: {bool(os.environ.get('CLOUDINARY_CLOUD_NAME'))}")
+app.config['SENDGRID_API_HOST'] = os.environ.get('SENDGRID_API_HOST', 'https://api.sendgrid.com')
+app.config['SENDGRID_POOL_SIZE'] = int(os.environ.get('SENDGRID_POOL_SIZE', 4))
+
+# Email outbox: requests queue emails, background workers deliver them.
+# Serverless functions have no workers and send right after queueing instead.
+app.config['EMAIL_TRANSPORT'] = os.environ.get('EMAIL_TRANSPORT', 'sendgrid')  # sendgrid, stub
+app.config['EMAIL_DELIVER_INLINE'] = os.environ.get(
+    'EMAIL_DELIVER_INLINE', '1' if database_deployment_target() == 'serverless' else '0'
+) == '1'
+app.config['EMAIL_OUTBOX_WORKERS'] = int(os.environ.get('EMAIL_OUTBOX_WORKERS', 0 if app.config['EMAIL_DELIVER_INLINE'] else 2))
+app.config['EMAIL_MAX_ATTEMPTS'] = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 6))
+app.config['EMAIL_RETRY_BACKOFF'] = int(os.environ.get('EMAIL_RETRY_BACKOFF', 30))
+app.config['EMAIL_POLL_INTERVAL'] = int(os.environ.get('EMAIL_POLL_INTERVAL', 5))
+# Cloudinary Configuration, the SDK is imported on the first upload
+app.config['CLOUDINARY_CLOUD_NAME'] = os.environ.get('CLOUDINARY_CLOUD_NAME')
+app.config['CLOUDINARY_API_KEY'] = os.environ.get('CLOUDINARY_API_KEY')
+app.config['CLOUDINARY_API_SECRET'] = os.environ.get('CLOUDINARY_API_SECRET')
+# Point at a local mock with: flask --app api/index.py cloudinary-mock
+app.config['CLOUDINARY_UPLOAD_PREFIX'] = os.environ.get('CLOUDINARY_UPLOAD_PREFIX')
+# Cover images upload on a background pool; 0 workers uploads inline, the default on serverless hosts
+app.config['CLOUDINARY_UPLOAD_WORKERS'] = int(os.environ.get(
+    'CLOUDINARY_UPLOAD_WORKERS', 0 if database_deployment_target() == 'serverless' else 2
+))
+# Files larger than this are sent in chunks of this size
+app.config['CLOUDINARY_CHUNK_SIZE'] = int(os.environ.get('CLOUDINARY_CHUNK_SIZE', 6 * 1024 * 1024))
+app.config['CLOUDINARY_UPLOAD_DIR'] = os.environ.get('CLOUDINARY_UPLOAD_DIR', os.path.join(tempfile.gettempdir(), 'tegura-uploads'))
+
 DATABASE_URL = os.environ.get('DATABASE_URL', 'sqlite:///tegura.db')
 if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
     DATABASE_URL = DATABASE_URL.replace('postgres://', 'postgresql://', 1)
@@ -47,17 +90,607 @@ if DATABASE_URL and DATABASE_URL.startswith('postgres://'):
 app.config['SQLALCHEMY_DATABASE_URI'] = DATABASE_URL
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
-db = SQLAlchemy(app)
-bcrypt = Bcrypt(app)
+# Database engine profiles
+class TimingMetrics:
+    """Thread-safe call count, failure count and latency totals"""
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total_seconds = 0.0
+        self.max_seconds = 0.0
+        self._lock = threading.Lock()
+
+    def record(self, seconds, ok=True):
+        with self._lock:
+            self.calls += 1
+            if not ok:
+                self.failures += 1
+            self.total_seconds += seconds
+            self.max_seconds = max(self.max_seconds, seconds)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'calls': self.calls,
+                'failures': self.failures,
+                'avg_ms': round(self.total_seconds / self.calls * 1000, 1) if self.calls else 0.0,
+                'max_ms': round(self.max_seconds * 1000, 1)
+            }
+
+
+pool_checkout_wait = TimingMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool that records how long each checkout waited for a free connection"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        ok = False
+        try:
+            connection = super()._do_get()
+            ok = True
+            return connection
+        finally:
+            waited = time.perf_counter() - started
+            pool_checkout_wait.record(waited, ok=ok)
+            prometheus_metrics().pool_checkout_wait.observe(waited)
+
+
+def database_engine_options(database_url, target='server'):
+    """
+    Pick SQLAlchemy engine options for the database backend and deployment target
+    
+    Args:
+        database_url: the SQLAlchemy database URL
+        target: 'server' (gunicorn) or 'serverless' (one short-lived process per request)
+    
+    Returns:
+        dict: options for SQLALCHEMY_ENGINE_OPTIONS
+    """
+    if database_url.startswith('sqlite'):
+        # pysqlite's timeout is its busy handler; configure_sqlite_engine sets the rest
+        return {'connect_args': {'timeout': SQLITE_BUSY_TIMEOUT_MS / 1000}}
+    if not database_url.startswith('postgresql'):
+        return {}
+    
+    statement_timeout_ms = int(os.environ.get('DB_STATEMENT_TIMEOUT_MS', 30000))
+    options = {
+        'pool_pre_ping': True,
+        'connect_args': {
+            'connect_timeout': int(os.environ.get('DB_CONNECT_TIMEOUT', 10)),
+            'keepalives': 1,
+            'keepalives_idle': 30,
+        }
+    }
+    
+    pgbouncer = os.environ.get('DB_PGBOUNCER', '').lower() in ('1', 'true', 'yes')
+    if pgbouncer:
+        # PgBouncer owns the pooling and rejects the startup 'options'
+        # parameter, so set statement_timeout on the database role instead.
+        options['poolclass'] = NullPool
+        return options
+    
+    options['connect_args']['options'] = f'-c statement_timeout={statement_timeout_ms}'
+    
+    if target == 'serverless':
+        # A function instance serves one request at a time and may be frozen
+        # between requests, so never keep idle connections around.
+        options['poolclass'] = NullPool
+        return options
+    
+    # One connection per request thread plus one per background thread
+    # (email outbox and cover upload workers), which check out from the same pool
+    threads = int(os.environ.get('GUNICORN_THREADS', 1))
+    default_pool_size = threads + app.config['EMAIL_OUTBOX_WORKERS'] + app.config['CLOUDINARY_UPLOAD_WORKERS']
+    options.update({
+        'poolclass': TimedQueuePool,
+        'pool_size': int(os.environ.get('DB_POOL_SIZE', default_pool_size)),
+        'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 2)),
+        'pool_timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        # Render and most managed Postgres drop idle connections after a few minutes
+        'pool_recycle': int(os.environ.get('DB_POOL_RECYCLE', 280)),
+    })
+    return options
+
+
+# SQLite profile: WAL lets readers in every worker run alongside one writer,
+# and write transactions take the lock up front (BEGIN IMMEDIATE) so they wait
+# on busy_timeout instead of failing with "database is locked" when a
+# deferred read transaction cannot be upgraded. Background threads read in
+# DEFERRED transactions and wrap their writes in sqlite_immediate(), so the
+# single write lock is never held across a SendGrid or Cloudinary call.
+# Endpoints that hash passwords do the same with write_transaction(), so the
+# lock is not held through bcrypt either.
+SQLITE_BUSY_TIMEOUT_MS = int(os.environ.get('SQLITE_BUSY_TIMEOUT_MS', 15000))
+SQLITE_MMAP_SIZE = int(os.environ.get('SQLITE_MMAP_SIZE', 256 * 1024 * 1024))
+
+# GET routes that write, so their transactions must also start as writers
+SQLITE_WRITE_ENDPOINTS = {'verify_email', 'view_module'}
+# POST routes that read and hash before writing; they write in write_transaction()
+SQLITE_DEFERRED_ENDPOINTS = {'login', 'register', 'reset_password'}
+
+
+_sqlite_begin = threading.local()
+
+
+@contextmanager
+def sqlite_immediate():
+    """Start transactions opened inside the block as writers, for background jobs"""
+    previous = getattr(_sqlite_begin, 'mode', None)
+    _sqlite_begin.mode = 'IMMEDIATE'
+    try:
+        yield
+    finally:
+        _sqlite_begin.mode = previous
+
+
+@contextmanager
+def write_transaction():
+    """
+    Commit the block's changes in a fresh writer transaction
+    
+    Ends the request's read transaction first: SQLite cannot upgrade a read
+    snapshot to a writer once another connection has committed. Objects
+    loaded before the block reload inside it.
+    """
+    db.session.rollback()
+    with sqlite_immediate():
+        yield
+        db.session.commit()
+
+
+def sqlite_transaction_mode():
+    """IMMEDIATE for requests that write and sqlite_immediate() blocks, DEFERRED otherwise"""
+    if getattr(_sqlite_begin, 'mode', None):
+        return _sqlite_begin.mode
+    if not has_request_context() or request.endpoint in SQLITE_DEFERRED_ENDPOINTS:
+        return 'DEFERRED'
+    if request.method not in ('GET', 'HEAD') or request.endpoint in SQLITE_WRITE_ENDPOINTS:
+        return 'IMMEDIATE'
+    return 'DEFERRED'
+
+
+def configure_sqlite_engine(engine):
+    """Apply the WAL pragmas to every new connection and take over BEGIN from pysqlite"""
+    
+    @event.listens_for(engine, 'connect')
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        # Stop pysqlite from issuing its own BEGIN so the 'begin' hook decides the mode
+        dbapi_connection.isolation_level = None
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA journal_mode=WAL')
+        cursor.execute('PRAGMA synchronous=NORMAL')
+        cursor.execute(f'PRAGMA busy_timeout={SQLITE_BUSY_TIMEOUT_MS}')
+        cursor.execute(f'PRAGMA mmap_size={SQLITE_MMAP_SIZE}')
+        cursor.execute('PRAGMA temp_store=MEMORY')
+        cursor.close()
+    
+    @event.listens_for(engine, 'begin')
+    def begin_sqlite_transaction(connection):
+        connection.exec_driver_sql(f'BEGIN {sqlite_transaction_mode()}')
+
+
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = database_engine_options(DATABASE_URL, database_deployment_target())
+# Render runs init-db before each deploy; Vercel has no such hook, so serverless
+# functions create missing tables at cold start unless DB_CREATE_TABLES=0
+app.config['DB_CREATE_TABLES'] = os.environ.get(
+    'DB_CREATE_TABLES', '1' if database_deployment_target() == 'serverless' else '0'
+) == '1'
+
+# eager: create every module progress row on enrollment
+# lazy: create a row the first time the module is opened, a missing row means not_started
+app.config['MODULE_PROGRESS_MODE'] = os.environ.get('MODULE_PROGRESS_MODE', 'eager')
+
+# Shared content cache: version files under CONTENT_CACHE_DIR keep the workers
+# on one host in sync, REDIS_URL those on several hosts. An empty
+# CONTENT_CACHE_DIR keeps versions in memory, for a single process only.
+app.config['CONTENT_CACHE_TTL'] = int(os.environ.get('CONTENT_CACHE_TTL', 300))
+# Seconds the logged-in user's name and email are reused between requests
+app.config['USER_CACHE_TTL'] = int(os.environ.get('USER_CACHE_TTL', 60))
+# Rows per page on admin listings and the inbox; ?limit= may ask for up to LIST_PAGE_MAX
+app.config['LIST_PAGE_SIZE'] = int(os.environ.get('LIST_PAGE_SIZE', 50))
+app.config['LIST_PAGE_MAX'] = int(os.environ.get('LIST_PAGE_MAX', 200))
+# Password hashing: threads, hashes allowed to wait before logins are turned
+# away, and the per-hash latency the bcrypt cost is calibrated to (never
+# below 12) when a gunicorn worker starts. Set BCRYPT_LOG_ROUNDS to fix the
+# cost instead; serverless functions use 12 rather than calibrating on every
+# cold start.
+app.config['BCRYPT_WORKERS'] = int(os.environ.get('BCRYPT_WORKERS', 2))
+app.config['BCRYPT_MAX_PENDING'] = int(os.environ.get('BCRYPT_MAX_PENDING', 16))
+app.config['BCRYPT_TARGET_MS'] = int(os.environ.get('BCRYPT_TARGET_MS', 250))
+# Not Flask-Bcrypt's own BCRYPT_LOG_ROUNDS key, which must stay a number or unset
+app.config['PASSWORD_HASH_ROUNDS'] = int(os.environ.get(
+    'BCRYPT_LOG_ROUNDS', 12 if database_deployment_target() == 'serverless' else 0
+)) or None
+app.config['CONTENT_CACHE_DIR'] = os.environ.get('CONTENT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'tegura-cache'))
+app.config['REDIS_URL'] = os.environ.get('REDIS_URL')
+
+# Bound to the app in configure_app()
+db = SQLAlchemy()
+bcrypt = Bcrypt()
+
+
+# Request timing
+# Every request counts its SQL statements and the time it spent in the
+# database, rendering templates and calling SendGrid or Cloudinary. The totals
+# go out as a Server-Timing header (shown in the browser's network panel), as
+# one JSON log line, and into a rolling per-endpoint summary at /admin/performance.
+app.config['SERVER_TIMING'] = os.environ.get('SERVER_TIMING', '1') == '1'
+app.config['REQUEST_LOG'] = os.environ.get('REQUEST_LOG', '1') == '1'
+# Requests per endpoint kept for the summary, per worker
+app.config['REQUEST_TIMING_WINDOW'] = int(os.environ.get('REQUEST_TIMING_WINDOW', 500))
+
+
+class RequestTiming:
+    """Where one request's time went"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_seconds = 0.0
+        self.template_seconds = 0.0
+        self.external_seconds = {}
+        self._templates_open = []
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+
+def current_request_timing():
+    """The timing of the request on this thread, None for background work"""
+    return g.get('request_timing') if has_request_context() else None
+
+
+def record_external_call(service, seconds, ok=True):
+    """Count a call to an outside service and add its time to the current request"""
+    metrics = prometheus_metrics()
+    metrics.external_duration.labels(service).observe(seconds)
+    if not ok:
+        metrics.external_failures.labels(service).inc()
+    
+    timing = current_request_timing()
+    if timing is not None:
+        timing.external_seconds[service] = timing.external_seconds.get(service, 0.0) + seconds
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+class EndpointTimings:
+    """The last few hundred requests of each endpoint in this worker"""
+
+    def __init__(self, window=500):
+        self.window = window
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, endpoint, timing, total_seconds):
+        sample = (total_seconds, timing.sql_count, timing.sql_seconds,
+                  timing.template_seconds, sum(timing.external_seconds.values()))
+        with self._lock:
+            self._samples.setdefault(endpoint, deque(maxlen=self.window)).append(sample)
+
+    def summary(self):
+        """One row per endpoint, slowest p95 first"""
+        with self._lock:
+            samples = {endpoint: list(rows) for endpoint, rows in self._samples.items()}
+        
+        def ms(seconds):
+            return round(seconds * 1000, 1)
+        
+        rows = []
+        for endpoint, endpoint_samples in samples.items():
+            count = len(endpoint_samples)
+            totals = sorted(sample[0] for sample in endpoint_samples)
+            rows.append({
+                'endpoint': endpoint,
+                'requests': count,
+                'p50_ms': ms(percentile(totals, 50)),
+                'p95_ms': ms(percentile(totals, 95)),
+                'max_ms': ms(totals[-1]),
+                'avg_queries': round(sum(sample[1] for sample in endpoint_samples) / count, 1),
+                'avg_db_ms': ms(sum(sample[2] for sample in endpoint_samples) / count),
+                'avg_template_ms': ms(sum(sample[3] for sample in endpoint_samples) / count),
+                'avg_external_ms': ms(sum(sample[4] for sample in endpoint_samples) / count)
+            })
+        return sorted(rows, key=lambda row: row['p95_ms'], reverse=True)
+
+
+endpoint_timings = EndpointTimings(app.config['REQUEST_TIMING_WINDOW'])
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info['statement_started'] = time.perf_counter()
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.pop('statement_started', None)
+    timing = current_request_timing()
+    if timing is not None and started is not None:
+        timing.sql_count += 1
+        timing.sql_seconds += time.perf_counter() - started
+
+
+@before_render_template.connect_via(app)
+def start_template_timer(sender, template, context, **extra):
+    timing = current_request_timing()
+    if timing is not None:
+        timing._templates_open.append(time.perf_counter())
+
+
+@template_rendered.connect_via(app)
+def stop_template_timer(sender, template, context, **extra):
+    timing = current_request_timing()
+    if timing is not None and timing._templates_open:
+        started = timing._templates_open.pop()
+        # A render_template called while rendering is already inside the outer one
+        if not timing._templates_open:
+            timing.template_seconds += time.perf_counter() - started
+
+
+def server_timing_header(timing, total_seconds):
+    """Server-Timing value: db, tpl, one entry per outside service, total"""
+    metrics = [
+        f'db;dur={timing.sql_seconds * 1000:.1f};desc="{timing.sql_count} queries"',
+        f'tpl;dur={timing.template_seconds * 1000:.1f}'
+    ]
+    for service, seconds in sorted(timing.external_seconds.items()):
+        metrics.append(f'{service};dur={seconds * 1000:.1f}')
+    metrics.append(f'total;dur={total_seconds * 1000:.1f}')
+    return ', '.join(metrics)
+
+
+@app.before_request
+def start_request_timing():
+    g.request_timing = RequestTiming()
+
+
+@app.after_request
+def report_request_timing(response):
+    timing = g.get('request_timing')
+    if timing is None:
+        return response
+    
+    total_seconds = timing.elapsed()
+    if app.config['SERVER_TIMING']:
+        response.headers['Server-Timing'] = server_timing_header(timing, total_seconds)
+    
+    endpoint = request.endpoint or 'unmatched'
+    if endpoint == 'static':
+        return response
+    endpoint_timings.record(endpoint, timing, total_seconds)
+    metrics = prometheus_metrics()
+    metrics.request_duration.labels(endpoint).observe(total_seconds)
+    metrics.requests.labels(endpoint, request.method, str(response.status_code)).inc()
+    if app.config['REQUEST_LOG']:
+        # The route pattern, not the path, so tokens in URLs stay out of the logs
+        print(json.dumps({
+            'event': 'request',
+            'method': request.method,
+            'route': request.url_rule.rule if request.url_rule else None,
+            'endpoint': endpoint,
+            'status': response.status_code,
+            'duration_ms': round(total_seconds * 1000, 1),
+            'sql_count': timing.sql_count,
+            'sql_ms': round(timing.sql_seconds * 1000, 1),
+            'template_ms': round(timing.template_seconds * 1000, 1),
+            'external_ms': {service: round(seconds * 1000, 1) for service, seconds in timing.external_seconds.items()}
+        }), flush=True)
+    return response
+
+
+# Prometheus metrics
+# /metrics exposes per-endpoint request latency and counts, database pool usage
+# and SendGrid/Cloudinary call times. Under gunicorn every worker writes its
+# samples to PROMETHEUS_MULTIPROC_DIR (set in gunicorn.conf.py), so a scrape
+# answered by any worker reports the totals of all of them.
+# /metrics answers a signed-in admin, or a scraper sending
+# "Authorization: Bearer <METRICS_TOKEN>". It is only open without either in debug mode.
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class PrometheusMetrics:
+    """The app's Prometheus collectors"""
+
+    def __init__(self):
+        from prometheus_client import Counter, Gauge, Histogram
+        self.request_duration = Histogram(
+            'tyi_http_request_duration_seconds', 'Time to handle a request',
+            ['endpoint'], buckets=LATENCY_BUCKETS
+        )
+        self.requests = Counter(
+            'tyi_http_requests_total', 'Requests handled, by response status',
+            ['endpoint', 'method', 'status']
+        )
+        # livesum: add up the workers that are still running
+        self.pool_checked_out = Gauge(
+            'tyi_db_pool_checked_out', 'Database connections in use', multiprocess_mode='livesum'
+        )
+        self.pool_overflow = Gauge(
+            'tyi_db_pool_overflow', 'Database connections open beyond the pool size', multiprocess_mode='livesum'
+        )
+        self.pool_checkout_wait = Histogram(
+            'tyi_db_pool_checkout_wait_seconds', 'Time spent waiting for a free database connection',
+            buckets=(0.001, 0.01, 0.1, 0.5, 1.0, 5.0, 10.0, 30.0)
+        )
+        self.external_duration = Histogram(
+            'tyi_external_call_duration_seconds', 'Time spent calling an outside service',
+            ['service'], buckets=LATENCY_BUCKETS
+        )
+        self.external_failures = Counter(
+            'tyi_external_call_failures_total', 'Calls to an outside service that failed',
+            ['service']
+        )
+
+    def render(self):
+        """The text exposition of every worker's metrics, or this process's alone outside gunicorn"""
+        from prometheus_client import CollectorRegistry, REGISTRY, generate_latest
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            from prometheus_client import multiprocess
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry)
+
+
+_prometheus_metrics = None
+_prometheus_metrics_lock = threading.Lock()
+
+
+def prometheus_metrics():
+    """The process-wide collectors, created on first use so startup skips the import"""
+    global _prometheus_metrics
+    if _prometheus_metrics is None:
+        with _prometheus_metrics_lock:
+            if _prometheus_metrics is None:
+                _prometheus_metrics = PrometheusMetrics()
+    return _prometheus_metrics
+
+
+def watch_pool_usage(engine):
+    """Keep the pool gauges current as connections are checked out and returned"""
+    pool = engine.pool
+    if not isinstance(pool, QueuePool):
+        return
+    
+    def update_pool_gauges(*args):
+        metrics = prometheus_metrics()
+        metrics.pool_checked_out.set(pool.checkedout())
+        # overflow() counts up from -pool_size until the pool is full
+        metrics.pool_overflow.set(max(pool.overflow(), 0))
+    
+    event.listen(pool, 'checkout', update_pool_gauges)
+    event.listen(pool, 'checkin', update_pool_gauges)
+
+
+@app.route('/metrics')
+def metrics():
+    """Prometheus scrape endpoint"""
+    token = app.config['METRICS_TOKEN']
+    scraper = bool(token) and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}')
+    if not (scraper or session.get('admin_logged_in') or app.debug):
+        return 'Unauthorized', 401
+    
+    from prometheus_client import CONTENT_TYPE_LATEST
+    return app.response_class(prometheus_metrics().render(), content_type=CONTENT_TYPE_LATEST)
+
+
+# Password hashing
+class PasswordHasherBusy(Exception):
+    """Raised when too many password hashes are already queued"""
+
+
+class PasswordHasher:
+    """
+    Runs bcrypt on a small dedicated thread pool
+    
+    Only `workers` hashes burn CPU at once, so a wave of logins cannot take
+    every core from page requests, and once `max_pending` hashes are running
+    or queued further ones fail fast with PasswordHasherBusy.
+    
+    Both bounds are per process and only matter with several request threads
+    (gthread workers). A sync worker serves one request at a time, so it never
+    has more than one hash in flight and WEB_CONCURRENCY is the real limit.
+    """
+
+    # Calibration only ever raises the cost above the old fixed default of 12
+    MIN_ROUNDS = 12
+    MAX_ROUNDS = 15
+    # Cheaper cost the calibration times, scaled up from there
+    SAMPLE_ROUNDS = 10
+
+    def __init__(self, rounds=None, target_ms=250, workers=2, max_pending=16):
+        self._rounds = rounds
+        self.target_ms = target_ms
+        self.calibrated = rounds is None
+        self.workers = workers
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._executor = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def calibrate(cls, target_ms):
+        """Highest cost whose hash takes no longer than target_ms on this machine"""
+        samples = []
+        for _ in range(3):
+            started = time.perf_counter()
+            bcrypt.generate_password_hash('calibration', rounds=cls.SAMPLE_ROUNDS)
+            samples.append((time.perf_counter() - started) * 1000)
+        # Each extra round doubles the work
+        rounds = cls.SAMPLE_ROUNDS + int(math.log2(max(target_ms / min(samples), 1)))
+        return max(cls.MIN_ROUNDS, min(rounds, cls.MAX_ROUNDS))
+
+    @property
+    def rounds(self):
+        if self._rounds is None:
+            self.prepare()
+        return self._rounds
+
+    def prepare(self):
+        """
+        Calibrate now if no cost was configured
+        
+        gunicorn's post_worker_init hook calls this before the worker takes
+        requests; otherwise (flask run) the first hash calibrates.
+        """
+        with self._lock:
+            if self._rounds is None:
+                self._rounds = self.calibrate(self.target_ms)
+                print(f"✅ bcrypt cost calibrated to {self._rounds} for {self.target_ms}ms per hash")
+
+    def _pool(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='bcrypt')
+            return self._executor
+
+    def _run(self, function, *args):
+        if not self._slots.acquire(blocking=False):
+            raise PasswordHasherBusy()
+        try:
+            return self._pool().submit(function, *args).result()
+        finally:
+            self._slots.release()
+
+    def hash(self, password):
+        return self._run(bcrypt.generate_password_hash, password, self.rounds).decode('utf-8')
+
+    def check(self, password_hash, password):
+        return self._run(bcrypt.check_password_hash, password_hash, password)
+
+    def needs_rehash(self, password_hash):
+        """True if the hash was made with a different cost than the configured one"""
+        rounds = int(password_hash.split('$')[2])
+        # A calibrated cost can differ by one between workers, only ever go up then
+        return rounds < self.rounds if self.calibrated else rounds != self.rounds
+
+
+password_hasher = PasswordHasher(
+    rounds=app.config['PASSWORD_HASH_ROUNDS'],
+    target_ms=app.config['BCRYPT_TARGET_MS'],
+    workers=app.config['BCRYPT_WORKERS'],
+    max_pending=app.config['BCRYPT_MAX_PENDING']
+)
 KIGALI_TZ = timezone(timedelta(hours=2))
 
 login_manager = LoginManager()
-login_manager.init_app(app)
 login_manager.login_view = 'login' 
 
 @login_manager.user_loader
 def load_user(user_id):
-    return TYI.query.get(int(user_id))
+    return load_session_user(int(user_id))
 
 # Create model to store users (User Auth)
 class TYI(db.Model, UserMixin):
@@ -67,11 +700,11 @@ class TYI(db.Model, UserMixin):
     email = db.Column(db.String(200), nullable=False, unique=True)
     password = db.Column(db.String(300), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    reset_token = db.Column(db.String(200), nullable=True)
+    reset_token = db.Column(db.String(200), nullable=True, index=True)
     reset_token_expiry = db.Column(db.DateTime, nullable=True)
 
     email_verified = db.Column(db.Boolean, default=False, nullable=False)
-    verification_token = db.Column(db.String(200), nullable=True)
+    verification_token = db.Column(db.String(200), nullable=True, index=True)
     verification_token_expiry = db.Column(db.DateTime, nullable=True)
 
     # relationships to be defined later
@@ -85,10 +718,10 @@ class TYI(db.Model, UserMixin):
 
     @pwd.setter
     def pwd(self, plain_text_password):
-        self.password = bcrypt.generate_password_hash(plain_text_password).decode('utf-8')
+        self.password = password_hasher.hash(plain_text_password)
 
     def check_password(self, plain_text_password):
-        return bcrypt.check_password_hash(self.password, plain_text_password)
+        return password_hasher.check(self.password, plain_text_password)
 
     def get_initials(self):
         """Get user initials for profile"""
@@ -124,6 +757,11 @@ class UserCourse(db.Model):
     enrolled_at = db.Column(db.DateTime, default=datetime.utcnow)
     completed_at = db.Column(db.DateTime, nullable=True)
 
+    __table_args__ = (
+        db.Index('ix_user_course_user_id_course_id', 'user_id', 'course_id'),
+        db.Index('ix_user_course_course_id', 'course_id'),
+    )
+
 # Create Application model
 # Update Application model
 class Application(db.Model):
@@ -151,6 +789,12 @@ class Application(db.Model):
     # Relationship
     opportunity = db.relationship('ApplicationOpportunity', backref='applications')
 
+    __table_args__ = (
+        db.Index('ix_application_user_id_opportunity_id', 'user_id', 'opportunity_id'),
+        db.Index('ix_application_opportunity_id', 'opportunity_id'),
+        db.Index('ix_application_created_at_id', 'created_at', 'id'),
+    )
+
 
 # Create Message model
 class Message(db.Model):
@@ -167,6 +811,11 @@ class Message(db.Model):
     is_read = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_message_user_id_is_read_created_at', 'user_id', 'is_read', 'created_at'),
+        db.Index('ix_message_user_id_created_at_id', 'user_id', 'created_at', 'id'),
+    )
+
 # Create model for leaderboard
 class LeaderboardEntry(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -181,6 +830,11 @@ class LeaderboardEntry(db.Model):
     # Relationship
     user = db.relationship('TYI', backref='leaderboard_entry', uselist=False)
 
+    __table_args__ = (
+        db.Index('ix_leaderboard_entry_user_id', 'user_id'),
+        db.Index('ix_leaderboard_entry_rank', 'rank'),
+    )
+
 
 # Create CourseModule model
 class CourseModule(db.Model):
@@ -193,6 +847,10 @@ class CourseModule(db.Model):
     duration_days = db.Column(db.Integer, default=7)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_course_module_course_id_module_number', 'course_id', 'module_number'),
+    )
+
 # Create UserModuleProgress model
 class UserModuleProgress(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -205,6 +863,11 @@ class UserModuleProgress(db.Model):
     # Relationships
     module = db.relationship('CourseModule', backref='user_progress')
 
+    __table_args__ = (
+        db.Index('ix_user_module_progress_user_id_module_id', 'user_id', 'module_id'),
+        db.Index('ix_user_module_progress_module_id', 'module_id'),
+    )
+
 # Create ApplicationOpportunity model
 class ApplicationOpportunity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -216,6 +879,11 @@ class ApplicationOpportunity(db.Model):
     cover_image = db.Column(db.String(500), default='new.png')  # NEW - default to new.png
     status = db.Column(db.String(50), default='open')  # open, closed
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    __table_args__ = (
+        db.Index('ix_application_opportunity_status_deadline', 'status', 'deadline'),
+    )
+
 # Create Event model
 class Event(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -228,6 +896,10 @@ class Event(db.Model):
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_event_event_date', 'event_date'),
+    )
+
 # Create BlogPost model
 class BlogPost(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -240,6 +912,10 @@ class BlogPost(db.Model):
     is_published = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        db.Index('ix_blog_post_is_published_publish_date', 'is_published', 'publish_date'),
+    )
+
 # Create ActivityUpdate model
 class ActivityUpdate(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -250,6 +926,44 @@ class ActivityUpdate(db.Model):
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     is_active = db.Column(db.Boolean, default=True)
 
+    __table_args__ = (
+        db.Index('ix_activity_update_is_active_created_at', 'is_active', 'created_at'),
+    )
+
+# Create EmailOutbox model
+class EmailOutbox(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    to_email = db.Column(db.String(200), nullable=False)
+    reply_to = db.Column(db.String(200), nullable=True)
+    subject = db.Column(db.String(300), nullable=False)
+    html_content = db.Column(db.Text, nullable=False)
+    
+    # Delivery tracking
+    status = db.Column(db.String(50), default='pending', nullable=False)  # pending, sent, dead
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    next_attempt_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_email_outbox_status_next_attempt_at', 'status', 'next_attempt_at'),
+    )
+
+
+# Cover image uploads, kept in the database so /admin/uploads shows every worker's jobs
+class CoverUpload(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    table_name = db.Column(db.String(50), nullable=False)
+    record_id = db.Column(db.Integer, nullable=False)
+    filename = db.Column(db.String(300), nullable=False)
+    size_bytes = db.Column(db.Integer, nullable=False)
+    status = db.Column(db.String(50), default='queued', nullable=False)  # queued, uploading, done, failed
+    url = db.Column(db.String(500), nullable=True)
+    error = db.Column(db.Text, nullable=True)
+    queued_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
 @app.template_filter('kigali_time')
 def kigali_time_filter(dt):
     """Convert UTC datetime to Kigali time for display"""
@@ -306,43 +1020,682 @@ class SigninForm(FlaskForm):
     password = PasswordField(label='Password', validators=[Length(max=10, min=4), DataRequired()])
     submit = SubmitField('Sign in')
 
-def upload_image_to_cloudinary(file, folder="tegura"):
+def cloudinary_uploader():
+    """Import and configure the Cloudinary SDK, kept out of startup since few requests upload"""
+    import cloudinary
+    import cloudinary.uploader
+    cloudinary.config(
+        cloud_name=app.config['CLOUDINARY_CLOUD_NAME'],
+        api_key=app.config['CLOUDINARY_API_KEY'],
+        api_secret=app.config['CLOUDINARY_API_SECRET'],
+        upload_prefix=app.config['CLOUDINARY_UPLOAD_PREFIX']
+    )
+    return cloudinary.uploader
+
+
+def upload_image_to_cloudinary(file, folder="tegura", chunk_size=None):
     """
     Upload an image to Cloudinary and return the secure URL
     
     Args:
-        file: FileStorage object from request.files
+        file: path of a local file
         folder: Cloudinary folder name (default: 'tegura')
+        chunk_size: files larger than this are uploaded in chunks of this size
     
     Returns:
-        str: Cloudinary secure URL or None if upload fails
+        str: Cloudinary secure URL
+    
+    Raises:
+        Exception: whatever the Cloudinary SDK raised if the upload failed
     """
+    options = dict(
+        folder=folder,
+        resource_type="image",
+        overwrite=True,
+        transformation=[
+            {'width': 1200, 'height': 800, 'crop': 'limit'},
+            {'quality': 'auto:good'}
+        ]
+    )
+    uploader = cloudinary_uploader()
+    started = time.perf_counter()
+    ok = False
     try:
-        if file and file.filename:
-            # Upload to Cloudinary
-            result = cloudinary.uploader.upload(
-                file,
-                folder=folder,
-                resource_type="image",
-                overwrite=True,
-                transformation=[
-                    {'width': 1200, 'height': 800, 'crop': 'limit'},
-                    {'quality': 'auto:good'}
-                ]
-            )
-            return result['secure_url']
-        return None
-    except Exception as e:
-        print(f"Error uploading to Cloudinary: {str(e)}")
+        if chunk_size and os.path.getsize(file) > chunk_size:
+            # Each chunk is its own request, so a dropped connection costs one chunk
+            result = uploader.upload_large(file, chunk_size=chunk_size, **options)
+        else:
+            result = uploader.upload(file, **options)
+        ok = True
+    finally:
+        record_external_call('cloudinary', time.perf_counter() - started, ok=ok)
+    return result['secure_url']
+
+
+class CoverImageUploads:
+    """
+    Uploads admin cover images to Cloudinary on a background thread pool
+    
+    The request spools the file to disk and saves its record with a placeholder
+    image. A pool thread uploads the file and swaps the Cloudinary URL in,
+    unless the image was changed in the meantime. Every job is a CoverUpload
+    row, so failures show up at /admin/uploads whichever worker ran them.
+    """
+
+    def __init__(self, workers=2, chunk_size=None, spool_dir=None):
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.spool_dir = spool_dir or tempfile.gettempdir()
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def submit(self, file, model, record_id, placeholder, folder, cache_name):
+        """
+        Queue an upload whose URL replaces the placeholder on the record
+        
+        Args:
+            file: FileStorage object from request.files
+            model: model class with a cover_image column
+            record_id: id of the record to update
+            placeholder: cover_image value the record was saved with
+            folder: Cloudinary folder name
+            cache_name: content cache entry to invalidate once the URL is saved
+        
+        Returns:
+            int: id of the CoverUpload row tracking the job
+        """
+        os.makedirs(self.spool_dir, exist_ok=True)
+        path = os.path.join(self.spool_dir, f"{uuid.uuid4().hex}-{secure_filename(file.filename)}")
+        file.save(path)
+        
+        job = CoverUpload(
+            table_name=model.__tablename__,
+            record_id=record_id,
+            filename=file.filename,
+            size_bytes=os.path.getsize(path)
+        )
+        db.session.add(job)
+        db.session.flush()
+        # Read the id before committing: touching the expired row afterwards would
+        # open a new write transaction on this POST that blocks _run's own updates.
+        job_id = job.id
+        db.session.commit()
+        
+        if self.workers <= 0:
+            self._run(job_id, path, model, record_id, placeholder, folder, cache_name)
+        else:
+            self._pool().submit(self._run, job_id, path, model, record_id, placeholder, folder, cache_name)
+        return job_id
+
+    def _pool(self):
+        # Created on first use so every gunicorn worker gets its own threads after fork
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='cover-upload')
+            return self._executor
+
+    def _update_job(self, job_id, **values):
+        with app.app_context(), sqlite_immediate():
+            db.session.execute(db.update(CoverUpload).where(CoverUpload.id == job_id).values(**values))
+            db.session.commit()
+
+    def _run(self, job_id, path, model, record_id, placeholder, folder, cache_name):
+        started = time.perf_counter()
+        try:
+            self._update_job(job_id, status='uploading')
+            url = upload_image_to_cloudinary(path, folder=folder, chunk_size=self.chunk_size)
+            with app.app_context(), sqlite_immediate():
+                db.session.execute(
+                    db.update(model)
+                    .where(model.id == record_id, model.cover_image == placeholder)
+                    .values(cover_image=url)
+                )
+                db.session.execute(
+                    db.update(CoverUpload).where(CoverUpload.id == job_id)
+                    .values(status='done', url=url, finished_at=datetime.utcnow())
+                )
+                db.session.commit()
+            content_cache.invalidate(cache_name)
+        except Exception as e:
+            print(f"❌ Cover image upload for {model.__tablename__} {record_id} failed: {str(e)}")
+            try:
+                self._update_job(job_id, status='failed', error=str(e), finished_at=datetime.utcnow())
+            except Exception as update_error:
+                print(f"❌ Could not record the failed upload {job_id}: {str(update_error)}")
+        else:
+            print(f"✅ Image uploaded in {time.perf_counter() - started:.1f}s: {url}")
+        finally:
+            if os.path.exists(path):
+                os.remove(path)
+
+
+cover_uploads = CoverImageUploads(
+    workers=app.config['CLOUDINARY_UPLOAD_WORKERS'],
+    chunk_size=app.config['CLOUDINARY_CHUNK_SIZE'],
+    spool_dir=app.config['CLOUDINARY_UPLOAD_DIR']
+)
+
+# Responsive images
+# flask build-images writes resized AVIF/WebP copies of static/images into
+# static/images/derived and lists them in manifest.json for responsive_image().
+IMAGE_WIDTHS = (320, 480, 640, 960, 1280, 1920)
+IMAGE_FORMATS = (('avif', 'image/avif', {'quality': 50}), ('webp', 'image/webp', {'quality': 75, 'method': 6}))
+IMAGE_DERIVED_DIR = 'images/derived'
+_image_manifest = None
+
+
+def image_manifest():
+    """Derivative manifest written by build-images, empty until it has been run"""
+    global _image_manifest
+    if _image_manifest is None:
+        path = os.path.join(app.static_folder, IMAGE_DERIVED_DIR, 'manifest.json')
+        try:
+            with open(path) as f:
+                _image_manifest = json.load(f)
+        except (OSError, ValueError):
+            _image_manifest = {}
+    return _image_manifest
+
+
+def cloudinary_srcset(url):
+    """srcset for a Cloudinary URL, letting Cloudinary resize and pick the format"""
+    if '/image/upload/' not in url:
         return None
+    return ', '.join(
+        url.replace('/image/upload/', f'/image/upload/w_{width},c_limit,f_auto,q_auto/', 1) + f' {width}w'
+        for width in IMAGE_WIDTHS
+    )
+
+
+@app.template_global()
+def responsive_image(src, alt='', sizes='100vw', **attrs):
+    """
+    Render an image with srcset/sizes so browsers fetch a copy close to the displayed size
+    
+    Args:
+        src: file name under static/images, or an absolute (e.g. Cloudinary) URL
+        alt: alt text
+        sizes: the sizes attribute, the last entry is used on small screens
+        **attrs: other <img> attributes, class_ for class
+    
+    Returns:
+        Markup: a <picture> with AVIF and WebP sources when derivatives exist, else an <img>
+    """
+    attrs = {key.rstrip('_'): value for key, value in attrs.items()}
+    attrs.setdefault('loading', 'lazy')
+    attrs.setdefault('decoding', 'async')
+    
+    sources = []
+    srcset = None
+    if src.startswith('http'):
+        url = src
+        srcset = cloudinary_srcset(src)
+    else:
+        url = url_for('static', filename=f'images/{src}')
+        entry = image_manifest().get(src)
+        if entry:
+            for fmt, mimetype, _ in IMAGE_FORMATS:
+                candidates = ', '.join(
+                    f"{url_for('static', filename=f'{IMAGE_DERIVED_DIR}/{name}')} {width}w"
+                    for width, name, _ in entry['variants'].get(fmt, [])
+                )
+                if candidates:
+                    sources.append(f'<source type="{mimetype}" srcset="{candidates}" sizes="{escape(sizes)}">')
+    
+    img_attrs = ''.join(f' {key}="{escape(value)}"' for key, value in attrs.items())
+    if srcset:
+        img_attrs += f' srcset="{escape(srcset)}" sizes="{escape(sizes)}"'
+    img = f'<img src="{escape(url)}" alt="{escape(alt)}"{img_attrs}>'
+    if not sources:
+        return Markup(img)
+    return Markup(f'<picture>{"".join(sources)}{img}</picture>')
+
+
+def _sizes_to_pixels(sizes, viewport=412, density=2):
+    """Pixels needed for the small-screen entry of a sizes attribute"""
+    fallback = sizes.split(',')[-1].strip()
+    match = re.fullmatch(r'([\d.]+)(vw|px|rem)', fallback)
+    if not match:
+        return viewport * density
+    value, unit = float(match.group(1)), match.group(2)
+    css_pixels = {'vw': viewport * value / 100, 'px': value, 'rem': value * 16}[unit]
+    return int(css_pixels * density)
+
+
+def image_savings_report(viewport=412, density=2):
+    """
+    Bytes each page's static images cost before and after derivatives, on a phone
+    
+    Templates are scanned for responsive_image() calls with a literal file name;
+    each image counts as the smallest AVIF derivative at least as wide as its
+    sizes attribute needs, or the largest one if none is.
+    
+    Returns:
+        dict: template name -> (original bytes, responsive bytes)
+    """
+    call = re.compile(r"responsive_image\(\s*'([^']+)'(?:[^)]*?sizes='([^']*)')?")
+    manifest = image_manifest()
+    report = {}
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for name in sorted(os.listdir(template_dir)):
+        if not name.endswith('.html'):
+            continue
+        with open(os.path.join(template_dir, name)) as f:
+            calls = call.findall(f.read())
+        if not calls:
+            continue
+        original = responsive = 0
+        for image, sizes in calls:
+            entry = manifest.get(image)
+            if not entry:
+                continue
+            needed = _sizes_to_pixels(sizes or '100vw', viewport, density)
+            variants = entry['variants'].get('avif') or entry['variants'].get('webp')
+            chosen = next((v for v in variants if v[0] >= needed), variants[-1])
+            original += entry['bytes']
+            responsive += chosen[2]
+        report[name] = (original, responsive)
+    return report
+
+# Static assets
+# flask build-assets records a content hash for every file under static/ in
+# assets.json. url_for('static') then links to css/main.<hash>.css, which is
+# served as immutable for a year, and text files get .br/.gz siblings that are
+# sent to browsers accepting those encodings.
+ASSET_MANIFEST = 'assets.json'
+ASSET_MAX_AGE = 365 * 24 * 60 * 60
+COMPRESSIBLE_EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt')
+# Already fingerprinted by build-images
+FINGERPRINTED_DIRS = (IMAGE_DERIVED_DIR + '/',)
+
+
+def hashed_asset_name(filename, digest):
+    stem, ext = os.path.splitext(filename)
+    return f'{stem}.{digest[:10]}{ext}'
+
+
+def asset_is_current(filename, entry):
+    """True if the file still has the size and content hash build-assets recorded"""
+    path = os.path.join(app.static_folder, filename)
+    try:
+        if os.path.getsize(path) != entry['bytes']:
+            return False
+        # Derived images are named by build-images, their names change with them
+        if filename.startswith(FINGERPRINTED_DIRS):
+            return True
+        with open(path, 'rb') as f:
+            return hashlib.sha256(f.read()).hexdigest() == entry['sha256']
+    except OSError:
+        return False
+
+
+def load_asset_manifest():
+    """
+    Read assets.json, skipping files whose content changed since build-assets ran
+    
+    Returns:
+        tuple: (filename -> manifest entry, hashed filename -> filename)
+    """
+    try:
+        with open(os.path.join(app.static_folder, ASSET_MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}, {}
+    
+    stale = [filename for filename, entry in manifest.items() if not asset_is_current(filename, entry)]
+    for filename in stale:
+        del manifest[filename]
+    if stale:
+        print(f"⚠️ {len(stale)} static files changed since build-assets, serving them unhashed: {', '.join(stale[:5])}")
+    return manifest, {entry['hashed']: filename for filename, entry in manifest.items()}
+
+
+asset_manifest, hashed_assets = load_asset_manifest()
+
+
+@app.url_defaults
+def hashed_static_url(endpoint, values):
+    if endpoint == 'static' and values.get('filename') in asset_manifest:
+        values['filename'] = asset_manifest[values['filename']]['hashed']
+
+
+def serve_static(filename):
+    """Static file view: long-lived caching for hashed names, precompressed bodies when accepted"""
+    immutable = filename in hashed_assets or filename.startswith(FINGERPRINTED_DIRS)
+    filename = hashed_assets.get(filename, filename)
+    entry = asset_manifest.get(filename)
+    
+    response = None
+    if entry:
+        accepted = request.accept_encodings
+        for encoding, suffix in (('br', '.br'), ('gzip', '.gz')):
+            if suffix in entry.get('compressed', {}) and accepted[encoding]:
+                response = send_from_directory(
+                    app.static_folder, filename + suffix,
+                    mimetype=mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+                )
+                response.headers['Content-Encoding'] = encoding
+                break
+        if entry.get('compressed'):
+            response = response or send_from_directory(app.static_folder, filename)
+            response.vary.add('Accept-Encoding')
+    response = response or send_from_directory(app.static_folder, filename)
+    
+    if immutable:
+        response.cache_control.no_cache = None
+        response.cache_control.public = True
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    return response
+
+
+app.view_functions['static'] = serve_static
 
 def generate_reset_token():
     """Generate a secure random token for password reset"""
     import secrets
     return secrets.token_urlsafe(32)
 
+# Email delivery
+class EmailDeliveryError(Exception):
+    """Raised by a transport when the provider did not accept a message"""
+
+
+class SendGridTransport:
+    """
+    Delivers email through the SendGrid v3 API
+
+    Requests go through one urllib3 connection pool per process, so the TLS
+    connection is kept alive and reused instead of handshaking per message.
+    """
+
+    # SendGrid accepts at most 1000 personalizations per request
+    MAX_PERSONALIZATIONS = 1000
+
+    def __init__(self, api_key, from_email, api_host='https://api.sendgrid.com', pool_size=4, timeout=10):
+        self.from_email = from_email
+        self.url = f"{api_host.rstrip('/')}/v3/mail/send"
+        self.headers = {
+            'Authorization': f'Bearer {api_key}',
+            'Content-Type': 'application/json'
+        }
+        import urllib3  # only workers that send email pay for the import
+        self.http_errors = urllib3.exceptions.HTTPError
+        self.http = urllib3.PoolManager(
+            maxsize=pool_size,
+            block=True,
+            retries=False,
+            timeout=urllib3.Timeout(total=timeout)
+        )
+        self.metrics = TimingMetrics()
+
+    def _post(self, payload):
+        started = time.perf_counter()
+        try:
+            response = self.http.request('POST', self.url, body=json.dumps(payload).encode('utf-8'), headers=self.headers)
+        except self.http_errors as e:
+            self.metrics.record(time.perf_counter() - started, ok=False)
+            record_external_call('sendgrid', time.perf_counter() - started, ok=False)
+            raise EmailDeliveryError(f"SendGrid request failed: {str(e)}")
+        
+        ok = response.status in [200, 201, 202]
+        self.metrics.record(time.perf_counter() - started, ok=ok)
+        record_external_call('sendgrid', time.perf_counter() - started, ok=ok)
+        if not ok:
+            raise EmailDeliveryError(f"SendGrid returned {response.status}: {response.data[:200].decode('utf-8', 'replace')}")
+
+    def send(self, to_email, subject, html_content, reply_to=None):
+        self.send_bulk([to_email], subject, html_content, reply_to=reply_to)
+
+    def send_bulk(self, recipients, subject, html_content, reply_to=None):
+        """
+        Send the same email to many recipients, each seeing only their own address
+        
+        Returns:
+            int: number of API calls made
+        """
+        calls = 0
+        for start in range(0, len(recipients), self.MAX_PERSONALIZATIONS):
+            payload = {
+                'personalizations': [
+                    {'to': [{'email': recipient}]}
+                    for recipient in recipients[start:start + self.MAX_PERSONALIZATIONS]
+                ],
+                'from': {'email': self.from_email},
+                'subject': subject,
+                'content': [{'type': 'text/html', 'value': html_content}]
+            }
+            if reply_to:
+                payload['reply_to'] = {'email': reply_to}
+            self._post(payload)
+            calls += 1
+        return calls
+
+
+class StubTransport:
+    """Keeps delivered emails in memory instead of sending them, for offline use"""
+
+    def __init__(self):
+        self.sent = []
+        self.metrics = TimingMetrics()
+
+    def send(self, to_email, subject, html_content, reply_to=None):
+        self.send_bulk([to_email], subject, html_content, reply_to=reply_to)
+
+    def send_bulk(self, recipients, subject, html_content, reply_to=None):
+        for recipient in recipients:
+            self.sent.append({
+                'to_email': recipient,
+                'subject': subject,
+                'html_content': html_content,
+                'reply_to': reply_to
+            })
+        self.metrics.record(0.0)
+        print(f"📭 [stub] Email to {', '.join(recipients[:3])}{'...' if len(recipients) > 3 else ''}: {subject}")
+        return 1
+
+
+_email_transport = None
+_email_transport_lock = threading.Lock()
+
+
+def get_email_transport():
+    """The process-wide email transport picked from the configuration"""
+    global _email_transport
+    with _email_transport_lock:
+        if _email_transport is None:
+            if app.config['EMAIL_TRANSPORT'] == 'stub':
+                _email_transport = StubTransport()
+            else:
+                _email_transport = SendGridTransport(
+                    SENDGRID_API_KEY,
+                    SENDGRID_FROM_EMAIL,
+                    api_host=app.config['SENDGRID_API_HOST'],
+                    pool_size=app.config['SENDGRID_POOL_SIZE']
+                )
+        return _email_transport
+
+
+class EmailOutboxWorkers:
+    """
+    Pool of background threads delivering queued EmailOutbox rows
+
+    A row is claimed by bumping its attempt counter and pushing next_attempt_at
+    out by a lease, so several threads and gunicorn workers can poll the same
+    table without sending a message twice. A worker that dies mid-send leaves
+    the row to be retried once the lease runs out. Failed sends back off
+    exponentially and are dead-lettered after max_attempts.
+    """
+
+    LEASE_SECONDS = 120
+    MAX_BACKOFF_SECONDS = 60 * 60
+
+    def __init__(self, workers=2, max_attempts=6, backoff=30, poll_interval=5, batch_size=10):
+        self.workers = workers
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.poll_interval = poll_interval
+        self.batch_size = batch_size
+        self.transport = None
+        self._threads = []
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+
+    def start(self):
+        """Start the worker threads once per process"""
+        with self._lock:
+            if self._threads or self.workers <= 0:
+                return
+            for number in range(self.workers):
+                thread = threading.Thread(target=self.run, name=f"email-outbox-{number}", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def wake(self):
+        """Tell idle workers there is new mail instead of waiting for the next poll"""
+        self._wake.set()
+
+    def stop(self):
+        self._stop.set()
+        self._wake.set()
+
+    def run(self):
+        while not self._stop.is_set():
+            try:
+                delivered = self.deliver_due()
+            except Exception as e:
+                print(f"❌ Email outbox worker error: {str(e)}")
+                delivered = 0
+            if not delivered:
+                self._wake.wait(self.poll_interval)
+                self._wake.clear()
+
+    def backoff_for(self, attempts):
+        return min(self.backoff * 2 ** (attempts - 1), self.MAX_BACKOFF_SECONDS)
+
+    def deliver_due(self):
+        """Deliver one batch of due emails and return how many were attempted"""
+        with app.app_context():
+            if self.transport is None:
+                self.transport = get_email_transport()
+            
+            # Plain copies, so the read transaction can end before anything is sent
+            due = snapshot_rows(EmailOutbox.query.filter(
+                EmailOutbox.status == 'pending',
+                EmailOutbox.next_attempt_at <= datetime.utcnow()
+            ).order_by(EmailOutbox.next_attempt_at).limit(self.batch_size).all())
+            db.session.rollback()
+            
+            attempted = 0
+            for email in due:
+                if self._claim(email):
+                    self._deliver(email)
+                    attempted += 1
+            return attempted
+
+    def _claim(self, email):
+        with sqlite_immediate():
+            claimed = db.session.execute(
+                db.update(EmailOutbox).where(
+                    EmailOutbox.id == email.id,
+                    EmailOutbox.status == 'pending',
+                    EmailOutbox.attempts == email.attempts
+                ).values(
+                    attempts=email.attempts + 1,
+                    next_attempt_at=datetime.utcnow() + timedelta(seconds=self.LEASE_SECONDS)
+                )
+            ).rowcount
+            db.session.commit()
+        if claimed:
+            email.attempts += 1
+        return bool(claimed)
+
+    def _deliver(self, email):
+        # No transaction is open during the send; the outcome is written afterwards
+        try:
+            self.transport.send(email.to_email, email.subject, email.html_content, reply_to=email.reply_to)
+        except Exception as e:
+            outcome = {'last_error': str(e)}
+            if email.attempts >= self.max_attempts:
+                outcome['status'] = 'dead'
+                print(f"❌ Email {email.id} to {email.to_email} dead-lettered after {email.attempts} attempts: {str(e)}")
+            else:
+                outcome['next_attempt_at'] = datetime.utcnow() + timedelta(seconds=self.backoff_for(email.attempts))
+                print(f"⚠️ Email {email.id} to {email.to_email} failed, retrying: {str(e)}")
+        else:
+            outcome = {'status': 'sent', 'sent_at': datetime.utcnow(), 'last_error': None}
+            print(f"✅ Email {email.id} sent to {email.to_email}")
+        with sqlite_immediate():
+            db.session.execute(db.update(EmailOutbox).where(EmailOutbox.id == email.id).values(**outcome))
+            db.session.commit()
+
+
+email_outbox = EmailOutboxWorkers(
+    workers=app.config['EMAIL_OUTBOX_WORKERS'],
+    max_attempts=app.config['EMAIL_MAX_ATTEMPTS'],
+    backoff=app.config['EMAIL_RETRY_BACKOFF'],
+    poll_interval=app.config['EMAIL_POLL_INTERVAL']
+)
+
+
+@app.before_request
+def start_email_outbox():
+    # Started lazily so every gunicorn worker gets its own threads after fork
+    email_outbox.start()
+
+
+def email_transport_configured():
+    """False when SendGrid is the transport but has no API key"""
+    return app.config['EMAIL_TRANSPORT'] != 'sendgrid' or bool(SENDGRID_API_KEY)
+
+
+def queue_email(to_email, subject, html_content, reply_to=None):
+    """
+    Write an email to the outbox for background delivery
+    
+    Args:
+        to_email: recipient address
+        subject: email subject
+        html_content: HTML body
+        reply_to: optional reply-to address
+    
+    Returns:
+        bool: True if the email was queued, False if it could not be
+    """
+    # Queueing without a transport would only dead-letter the email later,
+    # after the user had been told it was sent
+    if not email_transport_configured():
+        print(f"❌ SENDGRID_API_KEY is not set, not sending email to {to_email}")
+        return False
+    
+    try:
+        db.session.add(EmailOutbox(
+            to_email=to_email,
+            reply_to=reply_to,
+            subject=subject,
+            html_content=html_content
+        ))
+        db.session.commit()
+    except Exception as e:
+        db.session.rollback()
+        print(f"❌ Error queueing email to {to_email}: {str(e)}")
+        return False
+    
+    if not app.config['EMAIL_DELIVER_INLINE']:
+        email_outbox.wake()
+        return True
+    
+    # Nothing runs after the response on serverless hosts, so send now; this
+    # also retries earlier emails whose backoff has run out
+    try:
+        email_outbox.deliver_due()
+    except Exception as e:
+        print(f"❌ Error delivering email to {to_email}: {str(e)}")
+    return True
+
 def send_password_reset_email(user_email, reset_token):
-    """Send password reset email via SendGrid"""
+    """Queue password reset email for delivery"""
     try:
         # Find user
         user = TYI.query.filter_by(email=user_email).first()
@@ -398,31 +1751,14 @@ def send_password_reset_email(user_email, reset_token):
         </html>
         """
         
-        # Send email via SendGrid
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        email_message = Mail(
-            from_email=SENDGRID_FROM_EMAIL,
-            to_emails=user_email,
-            subject=email_subject,
-            html_content=email_body
-        )
-        
-        response = sg.send(email_message)
-        
-        if response.status_code in [200, 201, 202]:
-            print(f"✅ Password reset email sent to {user_email}")
-            return True
-        else:
-            print(f"⚠️ Failed to send reset email: {response.status_code}")
-            return False
+        return queue_email(user_email, email_subject, email_body)
             
     except Exception as e:
         print(f"❌ Error sending reset email: {str(e)}")
         return False
 
 def send_verification_email(user_email, verification_token):
-    """Send email verification link via SendGrid"""
+    """Queue email verification link for delivery"""
     try:
         # Find user
         user = TYI.query.filter_by(email=user_email).first()
@@ -478,31 +1814,14 @@ def send_verification_email(user_email, verification_token):
         </html>
         """
         
-        # Send email via SendGrid
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        email_message = Mail(
-            from_email=SENDGRID_FROM_EMAIL,
-            to_emails=user_email,
-            subject=email_subject,
-            html_content=email_body
-        )
-        
-        response = sg.send(email_message)
-        
-        if response.status_code in [200, 201, 202]:
-            print(f"✅ Verification email sent to {user_email}")
-            return True
-        else:
-            print(f"⚠️ Failed to send verification email: {response.status_code}")
-            return False
+        return queue_email(user_email, email_subject, email_body)
             
     except Exception as e:
         print(f"❌ Error sending verification email: {str(e)}")
         return False
 
 def send_certificate_request_email(user_email, user_name, course_title):
-    """Send certificate request notification to admin"""
+    """Queue certificate request notification to admin"""
     try:
         email_subject = f"Certificate Request - {user_name} for {course_title}"
         
@@ -563,32 +1882,184 @@ def send_certificate_request_email(user_email, user_name, course_title):
         </html>
         """
         
-        # Send email via SendGrid
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        email_message = Mail(
-            from_email=SENDGRID_FROM_EMAIL,
-            to_emails='admin@principie.tech',
-            subject=email_subject,
-            html_content=email_body
-        )
-        
         # Set reply-to as the student's email for easy communication
-        email_message.reply_to = user_email
-        
-        response = sg.send(email_message)
-        
-        if response.status_code in [200, 201, 202]:
-            print(f"✅ Certificate request sent for {user_name} - Course: {course_title}")
-            return True
-        else:
-            print(f"⚠️ Failed to send certificate request: {response.status_code}")
-            return False
+        return queue_email('admin@principie.tech', email_subject, email_body, reply_to=user_email)
             
     except Exception as e:
         print(f"❌ Error sending certificate request: {str(e)}")
         return False
 
+# Keyset pagination
+# Long listings are read one page at a time in their sort order. The cursor is
+# the sort key of the last row shown, so the next page is an index range scan
+# that starts after it instead of an OFFSET that rereads every earlier row.
+class KeysetPage:
+    """One page of rows and the cursor that continues after it"""
+
+    def __init__(self, items, next_cursor):
+        self.items = items
+        self.next_cursor = next_cursor
+
+
+def encode_cursor(values):
+    """Pack a row's sort key into an opaque URL-safe string"""
+    packed = [{'dt': value.isoformat()} if isinstance(value, datetime) else value for value in values]
+    raw = json.dumps(packed, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor, size):
+    """The sort key packed by encode_cursor, or None when the cursor is missing or malformed"""
+    if not cursor:
+        return None
+    try:
+        packed = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+        values = [datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value for value in packed]
+    except (ValueError, TypeError, KeyError):
+        return None
+    return values if len(values) == size else None
+
+
+def page_limit():
+    """Rows per page from ?limit=, kept between 1 and LIST_PAGE_MAX"""
+    limit = request.args.get('limit', app.config['LIST_PAGE_SIZE'], type=int)
+    return max(1, min(limit, app.config['LIST_PAGE_MAX']))
+
+
+def keyset_page(query, columns, cursor=None):
+    """
+    Fetch the page of a query that follows a cursor, newest first
+    
+    Args:
+        query: the filtered query to page through
+        columns: the sort key, most significant first; the last column must be unique
+        cursor: ?cursor= from the previous page, None for the first page
+    
+    Returns:
+        KeysetPage: the rows, and the cursor for the next page or None on the last page
+    """
+    limit = page_limit()
+    after = decode_cursor(cursor, len(columns))
+    if after is not None:
+        query = query.filter(db.tuple_(*columns) < db.tuple_(*after))
+    rows = query.order_by(*[column.desc() for column in columns]).limit(limit + 1).all()
+    
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor([getattr(rows[-1], column.key) for column in columns])
+    return KeysetPage(rows, next_cursor)
+
+
+def load_more_response(template, page, **context):
+    """Only the rows of a page, with the cursor for the page after in X-Next-Cursor"""
+    response = app.make_response(render_template(template, page=page, **context))
+    if page.next_cursor:
+        response.headers['X-Next-Cursor'] = page.next_cursor
+    return response
+
+
+# Anonymous page cache
+# Pages that look the same for every logged-out visitor are rendered once per
+# process and then served from memory with a strong ETag. Their forms carry an
+# empty CSRF field that the page fills in from /csrf-token.
+app.config['PAGE_CACHE'] = os.environ.get('PAGE_CACHE', '1') == '1'
+CACHED_PAGES = {'index_page', 'login', 'register', 'forgot_password'}
+
+
+def template_version():
+    """Digest of the templates and asset manifest, so a deploy never serves an old page"""
+    digest = hashlib.sha256()
+    template_dir = os.path.join(app.root_path, app.template_folder)
+    for root, dirs, files in sorted(os.walk(template_dir)):
+        for name in sorted(files):
+            with open(os.path.join(root, name), 'rb') as f:
+                digest.update(name.encode() + f.read())
+    digest.update(json.dumps(asset_manifest, sort_keys=True).encode())
+    return digest.hexdigest()[:16]
+
+
+class PageCache:
+    """Rendered pages keyed by path and template version"""
+
+    def __init__(self):
+        self._version = None
+        self._pages = {}
+        self._lock = threading.Lock()
+
+    @property
+    def version(self):
+        # Hashing the templates waits for the first cacheable request
+        if self._version is None:
+            self._version = template_version()
+        return self._version
+
+    def get(self, path):
+        return self._pages.get((path, self.version))
+
+    def put(self, path, body):
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        with self._lock:
+            self._pages[(path, self.version)] = (etag, body)
+        return etag
+
+
+page_cache = PageCache()
+
+
+def page_cacheable():
+    # Flashed messages are rendered into the page, so they bypass the cache
+    return (
+        app.config['PAGE_CACHE']
+        and not app.debug
+        and request.method in ('GET', 'HEAD')
+        and request.endpoint in CACHED_PAGES
+        and not request.query_string
+        and '_user_id' not in session
+        and '_flashes' not in session
+    )
+
+
+def cached_page_response(etag, body):
+    response = app.response_class(body, mimetype='text/html')
+    response.set_etag(etag)
+    # Revalidate every time, a flash or login changes what this visitor should see
+    response.cache_control.no_cache = True
+    response.vary.add('Cookie')
+    return response.make_conditional(request)
+
+
+@app.before_request
+def serve_cached_page():
+    g.page_cacheable = page_cacheable()
+    page = page_cache.get(request.path) if g.page_cacheable else None
+    g.page_cache_hit = page is not None
+    if page:
+        return cached_page_response(*page)
+
+
+@app.after_request
+def store_cached_page(response):
+    if not g.get('page_cacheable') or g.get('page_cache_hit'):
+        return response
+    if response.status_code != 200 or response.mimetype != 'text/html':
+        return response
+    
+    body = response.get_data()
+    token = g.get('csrf_token')
+    if token:
+        body = body.replace(token.encode(), b'')
+    return cached_page_response(page_cache.put(request.path, body), body)
+
+
+@app.route('/csrf-token')
+def csrf_token():
+    """CSRF token for forms on cached pages"""
+    response = jsonify({'csrf_token': generate_csrf()})
+    response.cache_control.no_store = True
+    return response
+
+
 @app.route('/', methods=['POST', 'GET'])
 def index_page():
     return render_template('index.html')
@@ -601,12 +2072,28 @@ def login():
     if form.validate_on_submit():
         user = TYI.query.filter_by(email=form.email.data).first()
         
-        if user and user.check_password(form.password.data):
+        try:
+            password_ok = user is not None and user.check_password(form.password.data)
+        except PasswordHasherBusy:
+            flash('Too many people are signing in right now. Please try again in a moment.', 'warning')
+            return render_template('login.html', form=form, show_resend=False, user_email=''), 503
+        
+        if password_ok:
             # Check if email is verified
             if not user.email_verified:
                 flash('Please verify your email before logging in. Check your inbox for the verification link.', 'warning')
                 return render_template('login.html', form=form, show_resend=True, user_email=form.email.data)
             
+            # Re-hash with the current cost while we have the plain password
+            if password_hasher.needs_rehash(user.password):
+                try:
+                    password_hash = password_hasher.hash(form.password.data)
+                except PasswordHasherBusy:
+                    password_hash = None  # Try again next login
+                if password_hash:
+                    with write_transaction():
+                        user.password = password_hash
+            
             login_user(user)
             flash('Logged in successfully!', 'success')
             return redirect(url_for('home'))
@@ -639,16 +2126,22 @@ def register():
                 verification_token=verification_token,
                 verification_token_expiry=datetime.utcnow() + timedelta(hours=24)  # 24 hour expiry
             )
-            db.session.add(user)
-            db.session.commit()
+            # The verification email is queued in the same writer transaction:
+            # its read of the new user could not be upgraded to the outbox insert
+            with write_transaction():
+                db.session.add(user)
+                email_sent = send_verification_email(form.email.data, verification_token)
             
-            # Send verification email
-            if send_verification_email(form.email.data, verification_token):
+            if email_sent:
                 flash('Account created! Please check your email to verify your account.', 'success')
             else:
                 flash('Account created but verification email failed to send. Please contact support.', 'warning')
             
             return redirect(url_for('login'))
+        except PasswordHasherBusy:
+            db.session.rollback()
+            flash('Too many people are signing up right now. Please try again in a moment.', 'warning')
+            return render_template('register.html', form=form), 503
         except Exception as e:
             db.session.rollback()
             flash(f'Error creating account: {str(e)}', 'danger')
@@ -787,69 +2280,381 @@ def reset_password(token):
             return render_template('reset_password.html', token=token)
         
         # Update password
-        user.pwd = new_password  # Uses the @pwd.setter which hashes the password
-        
-        # Clear reset token
-        user.reset_token = None
-        user.reset_token_expiry = None
+        try:
+            password_hash = password_hasher.hash(new_password)
+        except PasswordHasherBusy:
+            flash('The server is busy. Please try again in a moment.', 'warning')
+            return render_template('reset_password.html', token=token), 503
         
-        db.session.commit()
+        with write_transaction():
+            user.password = password_hash
+            # Clear reset token
+            user.reset_token = None
+            user.reset_token_expiry = None
         
         flash('Password reset successfully! You can now login.', 'success')
         return redirect(url_for('login'))
     
     return render_template('reset_password.html', token=token)
 
-@app.route('/home', methods=['POST', 'GET'])
-@login_required
-def home():
-    # Get user's courses
-    user_courses = UserCourse.query.filter_by(user_id=current_user.id).all()
-    
-    # Calculate training progress
-    if user_courses:
-        completed = len([c for c in user_courses if c.status == 'completed'])
-        total = len(user_courses)
-        overall_progress = sum(c.progress_percentage for c in user_courses) // total if total > 0 else 0
-    else:
-        completed = 0
-        total = 0
-        overall_progress = 0
-    
-    # Get application status
-    application = Application.query.filter_by(user_id=current_user.id).first()
+# Shared content cache
+class LocalVersionStore:
+    """Cache versions kept in process memory, only correct with a single worker"""
+
+    def __init__(self):
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, name):
+        return self._versions.get(name, 0)
+
+    def bump(self, name):
+        with self._lock:
+            self._versions[name] = self._versions.get(name, 0) + 1
+
+
+class FileVersionStore:
+    """Cache versions kept as files so every worker on the same host sees a bump"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name):
+        return os.path.join(self.directory, f"{name}.version")
+
+    def get(self, name):
+        try:
+            with open(self._path(name)) as version_file:
+                return version_file.read()
+        except FileNotFoundError:
+            return ''
+
+    def bump(self, name):
+        # Write a fresh token and swap it in atomically
+        tmp_path = f"{self._path(name)}.{uuid.uuid4().hex}"
+        with open(tmp_path, 'w') as version_file:
+            version_file.write(uuid.uuid4().hex)
+        os.replace(tmp_path, self._path(name))
+
+
+class RedisVersionStore:
+    """Cache versions kept in Redis so workers on every host see a bump"""
+
+    def __init__(self, url, prefix='tyi:content-cache:'):
+        import redis
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    def get(self, name):
+        return int(self.client.get(self.prefix + name) or 0)
+
+    def bump(self, name):
+        self.client.incr(self.prefix + name)
+
+
+class ContentCache:
+    """
+    Process-local cache for content that every user sees the same way
+
+    Entries expire after a TTL and are dropped as soon as their version in the
+    version store changes, so a bump from an admin route in one worker is seen
+    by all workers sharing the store.
+    """
+
+    def __init__(self, versions, ttl=300, max_entries=None):
+        self.versions = versions
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+
+    def get(self, name, loader, ttl=None):
+        version = self.versions.get(name)
+        entry = self._entries.get(name)
+        if entry and entry[0] == version and entry[1] > time.monotonic():
+            return entry[2]
+
+        if self.max_entries and len(self._entries) >= self.max_entries:
+            self._prune()
+        value = loader()
+        self._entries[name] = (version, time.monotonic() + (ttl or self.ttl), value)
+        return value
+
+    def invalidate(self, *names):
+        for name in names:
+            self.versions.bump(name)
+            self._entries.pop(name, None)
+
+    def _prune(self):
+        now = time.monotonic()
+        for name, entry in list(self._entries.items()):
+            if entry[1] <= now:
+                self._entries.pop(name, None)
+        # Still full of live entries: start over rather than track recency
+        if len(self._entries) >= self.max_entries:
+            self._entries.clear()
+
+
+def create_version_store():
+    """Pick the cache version store from the configuration"""
+    if app.config['REDIS_URL']:
+        return RedisVersionStore(app.config['REDIS_URL'])
+    if app.config['CONTENT_CACHE_DIR']:
+        return FileVersionStore(app.config['CONTENT_CACHE_DIR'])
+    return LocalVersionStore()
+
+
+content_cache = ContentCache(create_version_store(), ttl=app.config['CONTENT_CACHE_TTL'])
+
+
+def snapshot_row(row, **extra):
+    """Copy an ORM row's column values, plus any extra fields, into a plain object"""
+    return SimpleNamespace(**{column.key: getattr(row, column.key) for column in row.__table__.columns}, **extra)
+
+
+def snapshot_rows(rows):
+    """Copy column values out of ORM rows so they can outlive the session"""
+    return [snapshot_row(row) for row in rows]
+
+
+class UserSummary(SimpleNamespace):
+    """Read-only stand-in for TYI carrying only the fields shown next to a name"""
+
+    def get_initials(self):
+        return f"{self.firstname[0]}{self.lastname[0]}".upper()
+
+    def get_full_name(self):
+        return f"{self.firstname} {self.lastname}"
+
+
+# Logged-in user cache
+# When a user row changes through the ORM, its entry is dropped after commit in
+# every worker sharing the version store. The default store is per host, so
+# workers on several hosts (or Vercel instances) need REDIS_URL, or they may
+# serve the old row for up to USER_CACHE_TTL.
+class SessionUser(UserMixin, UserSummary):
+    """What current_user needs on every request, without an ORM instance"""
+
+
+identity_cache = ContentCache(create_version_store(), ttl=app.config['USER_CACHE_TTL'], max_entries=10000)
+
+
+def load_session_user(user_id):
+    """
+    Lightweight user for Flask-Login, cached for USER_CACHE_TTL seconds
     
-    # Get leaderboard position
-    leaderboard = LeaderboardEntry.query.filter_by(user_id=current_user.id).first()
+    Args:
+        user_id: id stored in the session
     
-    # Get unread messages count
-    unread_messages = Message.query.filter_by(user_id=current_user.id, is_read=False).count()
+    Returns:
+        SessionUser or None if the user no longer exists
+    """
+    def load():
+        row = db.session.execute(
+            db.select(TYI.id, TYI.firstname, TYI.lastname, TYI.email, TYI.email_verified)
+            .filter_by(id=user_id)
+        ).first()
+        return SessionUser(**row._asdict()) if row else None
     
+    return identity_cache.get(f'user-{user_id}', load)
+
+
+@event.listens_for(TYI, 'after_update')
+def remember_changed_user(mapper, connection, target):
+    object_session(target).info.setdefault('changed_user_ids', set()).add(target.id)
+
+
+@event.listens_for(db.session, 'after_commit')
+def invalidate_changed_users(session):
+    # After commit, so no other request can cache the old row again
+    for user_id in session.info.pop('changed_user_ids', ()):
+        identity_cache.invalidate(f'user-{user_id}')
+
+
+@event.listens_for(db.session, 'after_rollback')
+def forget_changed_users(session):
+    session.info.pop('changed_user_ids', None)
+
+
+# Materialized leaderboard
+LEADERBOARD_TOP_N = 10
+# The snapshot is rebuilt when an admin uploads or clears the leaderboard,
+# the TTL only catches edits made directly in the database.
+LEADERBOARD_TTL = 24 * 60 * 60
+
+
+class LeaderboardSnapshot:
+    """Precomputed leaderboard: ordered entries, top N and each user's entry"""
+
+    def __init__(self, entries, top_n=LEADERBOARD_TOP_N):
+        self.entries = entries
+        self.top_entries = entries[:top_n]
+        self.total_participants = len(entries)
+        self._entries_by_user = {}
+        for entry in entries:
+            self._entries_by_user.setdefault(entry.user_id, entry)
+
+    def entry_for(self, user_id):
+        """The user's leaderboard entry, or None if they are not ranked"""
+        return self._entries_by_user.get(user_id)
+
+
+def build_leaderboard_snapshot():
+    """Read the whole leaderboard with its users in one query"""
+    rows = db.session.query(
+        LeaderboardEntry.id, LeaderboardEntry.user_id, LeaderboardEntry.rank,
+        LeaderboardEntry.total_points, LeaderboardEntry.project_name, LeaderboardEntry.location,
+        TYI.firstname, TYI.lastname, TYI.email
+    ).outerjoin(TYI, TYI.id == LeaderboardEntry.user_id).order_by(LeaderboardEntry.rank, LeaderboardEntry.id).all()
+
+    entries = []
+    for row in rows:
+        user = None
+        if row.email is not None:
+            user = UserSummary(id=row.user_id, firstname=row.firstname, lastname=row.lastname, email=row.email)
+        entries.append(SimpleNamespace(
+            id=row.id,
+            user_id=row.user_id,
+            rank=row.rank,
+            total_points=row.total_points,
+            project_name=row.project_name,
+            location=row.location,
+            user=user
+        ))
+    return LeaderboardSnapshot(entries)
+
+
+def load_leaderboard():
+    """The current leaderboard snapshot, served from the content cache"""
+    return content_cache.get('leaderboard', build_leaderboard_snapshot, ttl=LEADERBOARD_TTL)
+
+
+# Dashboard service
+def user_dashboard_query(user_id):
+    """The single SELECT of scalar subqueries behind load_user_dashboard"""
+    def scalar(column, *criteria, order_by=None):
+        query = db.select(column).where(*criteria)
+        if order_by is not None:
+            query = query.order_by(order_by).limit(1)
+        return query.scalar_subquery()
+
+    user_course = UserCourse.user_id == user_id
+    user_application = Application.user_id == user_id
+
+    # The dashboard shows the user's first enrollment as the current course
+    first_course = db.select(UserCourse.id).where(user_course).order_by(UserCourse.id).limit(1).scalar_subquery()
+    first_course_id = db.select(UserCourse.course_id).where(UserCourse.id == first_course).scalar_subquery()
+
+    return db.select(
+        scalar(db.func.count(UserCourse.id), user_course).label('total_courses'),
+        scalar(db.func.count(UserCourse.id), user_course, UserCourse.status == 'completed').label('completed_courses'),
+        scalar(db.func.coalesce(db.func.sum(UserCourse.progress_percentage), 0), user_course).label('progress_sum'),
+        scalar(UserCourse.course_id, UserCourse.id == first_course).label('course_id'),
+        scalar(UserCourse.completed_modules, UserCourse.id == first_course).label('completed_modules'),
+        scalar(UserCourse.progress_percentage, UserCourse.id == first_course).label('progress_percentage'),
+        scalar(Course.title, Course.id == first_course_id).label('course_title'),
+        scalar(Course.total_modules, Course.id == first_course_id).label('course_total_modules'),
+        scalar(Application.id, user_application, order_by=Application.id).label('application_id'),
+        scalar(Application.status, user_application, order_by=Application.id).label('application_status'),
+        scalar(db.func.count(Message.id), Message.user_id == user_id, Message.is_read == False).label('unread_messages'),
+    )
+
+
+def load_user_dashboard(user_id):
+    """
+    Load every per-user field of the dashboard in one aggregate query
+
+    Args:
+        user_id: id of the user the dashboard is for
+
+    Returns:
+        dict: home.html context keys for the user's course stats, first
+        application, leaderboard position and unread message count. The
+        leaderboard position comes from the cached leaderboard snapshot.
+    """
+    row = db.session.execute(user_dashboard_query(user_id)).one()
+
+    total = row.total_courses
+    user_courses = []
+    if total:
+        user_courses.append(SimpleNamespace(
+            course_id=row.course_id,
+            completed_modules=row.completed_modules,
+            progress_percentage=row.progress_percentage,
+            course=SimpleNamespace(title=row.course_title, total_modules=row.course_total_modules)
+        ))
+
+    application = None
+    if row.application_id is not None:
+        application = SimpleNamespace(id=row.application_id, status=row.application_status)
+
+    return {
+        'completed_courses': row.completed_courses,
+        'total_courses': total,
+        'overall_progress': row.progress_sum // total if total > 0 else 0,
+        'application': application,
+        'leaderboard': load_leaderboard().entry_for(user_id),
+        'unread_messages': row.unread_messages,
+        'user_courses': user_courses,
+    }
+
+# Queries behind the shared feeds, also EXPLAINed by check-query-plans
+def open_opportunities_query():
+    return db.select(ApplicationOpportunity).filter_by(status='open').order_by(ApplicationOpportunity.deadline)
+
+
+def upcoming_events_query():
+    return db.select(Event).filter(Event.event_date >= datetime.now(KIGALI_TZ)).order_by(Event.event_date).limit(3)
+
+
+def published_blogs_query():
+    return db.select(BlogPost).filter_by(is_published=True).order_by(BlogPost.publish_date.desc()).limit(3)
+
+
+def recent_activities_query():
+    return db.select(ActivityUpdate).filter_by(is_active=True).order_by(ActivityUpdate.created_at.desc()).limit(3)
+
+
+def load_open_opportunities():
+    """Open opportunities ordered by deadline, served from the content cache"""
+    return content_cache.get('opportunities', lambda: snapshot_rows(
+        db.session.scalars(open_opportunities_query()).all()
+    ))
+
+def load_shared_feeds():
+    """Load the dashboard feeds that are the same for every user"""
     # Get open opportunities
-    open_opportunities = ApplicationOpportunity.query.filter_by(status='open').order_by(ApplicationOpportunity.deadline).limit(2).all()
+    open_opportunities = load_open_opportunities()[:2]
     
     # Get upcoming events (only future events, auto-filter past ones)
-    today = datetime.now(KIGALI_TZ)
-    upcoming_events = Event.query.filter(Event.event_date >= today).order_by(Event.event_date).limit(3).all()
+    upcoming_events = content_cache.get('events', lambda: snapshot_rows(
+        db.session.scalars(upcoming_events_query()).all()
+    ))
     
     # Get published blog posts
-    blog_posts = BlogPost.query.filter_by(is_published=True).order_by(BlogPost.publish_date.desc()).limit(3).all()
+    blog_posts = content_cache.get('blogs', lambda: snapshot_rows(
+        db.session.scalars(published_blogs_query()).all()
+    ))
     
     # Get recent activity updates
-    recent_activities = ActivityUpdate.query.filter_by(is_active=True).order_by(ActivityUpdate.created_at.desc()).limit(3).all()
+    recent_activities = content_cache.get('activities', lambda: snapshot_rows(
+        db.session.scalars(recent_activities_query()).all()
+    ))
+    
+    return {
+        'opportunities': open_opportunities,
+        'events': upcoming_events,
+        'blogs': blog_posts,
+        'activities': recent_activities,
+    }
+
+@app.route('/home', methods=['POST', 'GET'])
+@login_required
+def home():
+    context = load_user_dashboard(current_user.id)
+    context.update(load_shared_feeds())
     
-    return render_template('home.html',
-                         completed_courses=completed,
-                         total_courses=total,
-                         overall_progress=overall_progress,
-                         application=application,
-                         leaderboard=leaderboard,
-                         unread_messages=unread_messages,
-                         user_courses=user_courses,
-                         opportunities=open_opportunities,
-                         events=upcoming_events,
-                         blogs=blog_posts,
-                         activities=recent_activities)
+    return render_template('home.html', **context)
 
 @app.route('/contact', methods=['POST'])
 def contact_form():
@@ -871,14 +2676,11 @@ def contact_form():
             return redirect(url_for('index_page') + '#contact')  # Redirect to contact section
         
         # Check if API key exists
-        if not SENDGRID_API_KEY:
+        if not email_transport_configured():
             print("❌ ERROR: SENDGRID_API_KEY is not set!")
             flash('Email service is not configured. Please contact support.', 'danger')
             return redirect(url_for('index_page') + '#contact')
         
-        print(f"✅ API Key is set: {SENDGRID_API_KEY[:15]}...")
-        print(f"✅ From email: {SENDGRID_FROM_EMAIL}")
-        
         # Create email content
         email_subject = f"New Contact Form Submission from {first_name} {last_name}"
         
@@ -930,30 +2732,10 @@ def contact_form():
         </html>
         """
         
-        print("📤 Attempting to send email via SendGrid...")
-        
-        # Send email via SendGrid
-        sg = SendGridAPIClient(SENDGRID_API_KEY)
-        
-        email_message = Mail(
-            from_email=SENDGRID_FROM_EMAIL,
-            to_emails='admin@principie.tech',
-            subject=email_subject,
-            html_content=email_body
-        )
-        
         # Add reply-to so you can reply directly to the sender
-        email_message.reply_to = email
-        
-        response = sg.send(email_message)
-        
-        print(f"✅ SendGrid Response Status: {response.status_code}")
-        
-        if response.status_code in [200, 201, 202]:
-            print("✅ Email sent successfully!")
+        if queue_email('admin@principie.tech', email_subject, email_body, reply_to=email):
             flash('Thank you for contacting us! We will get back to you soon.', 'success')
         else:
-            print(f"⚠️ Unexpected status code: {response.status_code}")
             flash('There was an error sending your message. Please try again.', 'danger')
             
     except Exception as e:
@@ -985,17 +2767,10 @@ def enroll_course(course_id):
             enrolled_at=datetime.now(KIGALI_TZ)
         )
         db.session.add(new_enrollment)
-        db.session.flush()  # Get the ID
         
         # Auto-create module progress records for all modules in the course
-        modules = CourseModule.query.filter_by(course_id=course_id).all()
-        for module in modules:
-            module_progress = UserModuleProgress(
-                user_id=current_user.id,
-                module_id=module.id,
-                status='not_started'
-            )
-            db.session.add(module_progress)
+        if app.config['MODULE_PROGRESS_MODE'] != 'lazy':
+            create_module_progress(course_id, [current_user.id])
         
         db.session.commit()
         flash(f'Successfully enrolled in {course.title}!', 'success')
@@ -1079,38 +2854,36 @@ def request_certificate(course_id):
 @app.route('/home/leaderboard')
 @login_required
 def leaderboard():
-    # Get all leaderboard entries, ordered by rank
-    all_entries = LeaderboardEntry.query.order_by(LeaderboardEntry.rank).all()
-    
-    # Get current user's leaderboard entry
-    user_entry = LeaderboardEntry.query.filter_by(user_id=current_user.id).first()
-    
-    # Calculate total participants
-    total_participants = LeaderboardEntry.query.count()
-    
-    # Get top 10 entries for display
-    top_entries = all_entries[:10] if len(all_entries) >= 10 else all_entries
+    # Top entries, participant count and rank all come from the precomputed snapshot
+    snapshot = load_leaderboard()
     
     return render_template('leaderboard.html',
-                         user_entry=user_entry,
-                         top_entries=top_entries,
-                         total_participants=total_participants)
+                         user_entry=snapshot.entry_for(current_user.id),
+                         top_entries=snapshot.top_entries,
+                         total_participants=snapshot.total_participants)
 
 @app.route('/home/messages')
 @login_required
 def messages():
-    # Get all messages for current user
-    all_messages = Message.query.filter_by(user_id=current_user.id).order_by(Message.created_at.desc()).all()
+    # First page of the inbox, newest first
+    inbox = keyset_page(Message.query.filter_by(user_id=current_user.id), [Message.created_at, Message.id])
     
     # Count unread messages
     unread_count = Message.query.filter_by(user_id=current_user.id, is_read=False).count()
-    total_count = len(all_messages)
+    total_count = Message.query.filter_by(user_id=current_user.id).count()
     
     return render_template('messages.html',
-                         messages=all_messages,
+                         messages=inbox,
                          unread_count=unread_count,
                          total_count=total_count)
 
+@app.route('/home/messages/more')
+@login_required
+def messages_more():
+    inbox = keyset_page(Message.query.filter_by(user_id=current_user.id), [Message.created_at, Message.id],
+                        request.args.get('cursor'))
+    return load_more_response('partials/message_items.html', inbox)
+
 @app.route('/message/mark-read/<int:message_id>', methods=['POST'])
 @login_required
 def mark_message_read(message_id):
@@ -1152,7 +2925,7 @@ def profile():
     completed_courses = UserCourse.query.filter_by(user_id=current_user.id, status='completed').count()
     
     # Get leaderboard rank
-    leaderboard = LeaderboardEntry.query.filter_by(user_id=current_user.id).first()
+    leaderboard = load_leaderboard().entry_for(current_user.id)
     rank = leaderboard.rank if leaderboard else 0
     
     # Get applications count
@@ -1201,22 +2974,32 @@ def admin_portal():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    # Get all data
-    courses = Course.query.all()
-    users = TYI.query.all()
-    opportunities = ApplicationOpportunity.query.all()
-    events = Event.query.order_by(Event.event_date.desc()).all()
-    blogs = BlogPost.query.order_by(BlogPost.publish_date.desc()).all()
-    activities = ActivityUpdate.query.order_by(ActivityUpdate.created_at.desc()).all()
+    # Content is authored here and stays small; users are paged
+    courses = snapshot_rows(Course.query.all())
+    users = load_admin_user_page()
+    opportunities = snapshot_rows(ApplicationOpportunity.query.all())
+    events = snapshot_rows(Event.query.order_by(Event.event_date.desc()).all())
+    blogs = snapshot_rows(BlogPost.query.order_by(BlogPost.publish_date.desc()).all())
+    activities = snapshot_rows(ActivityUpdate.query.order_by(ActivityUpdate.created_at.desc()).all())
     
     return render_template('admin.html', 
                          courses=courses, 
                          users=users,
+                         user_count=TYI.query.count(),
                          opportunities=opportunities,
                          events=events,
                          blogs=blogs,
                          activities=activities,
-                         LeaderboardEntry=LeaderboardEntry)
+                         top_entries=load_leaderboard().top_entries)
+
+
+@app.route('/admin/users/more')
+def admin_users_more():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    users = load_admin_user_page(request.args.get('cursor'))
+    return load_more_response('partials/admin_user_cards.html', users)
 
 
 @app.route('/admin/logout')
@@ -1271,14 +3054,18 @@ def admin_send_message():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    user_id = int(request.form.get('user_id'))
+    user = TYI.query.filter_by(email=request.form.get('email', '').strip()).first()
+    if not user:
+        flash('No user is registered with that email address.', 'danger')
+        return redirect(url_for('admin_portal'))
+    
     title = request.form.get('title')
     content = request.form.get('content')
     message_type = request.form.get('message_type')
     icon_type = request.form.get('icon_type')
     
     new_message = Message(
-        user_id=user_id,
+        user_id=user.id,
         title=title,
         content=content,
         message_type=message_type,
@@ -1317,6 +3104,10 @@ def admin_add_module(course_id):
     )
     
     db.session.add(new_module)
+    db.session.flush()
+    
+    # The course has one more module, so every enrollment's percentage changes
+    reconcile_course_progress(course_id)
     db.session.commit()
     flash(f'Module "{title}" added to {course.title}!', 'success')
     
@@ -1328,8 +3119,8 @@ def admin_manage_course(course_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    course = Course.query.get_or_404(course_id)
-    modules = CourseModule.query.filter_by(course_id=course_id).order_by(CourseModule.module_number).all()
+    course = snapshot_row(Course.query.get_or_404(course_id))
+    modules = snapshot_rows(CourseModule.query.filter_by(course_id=course_id).order_by(CourseModule.module_number).all())
     
     return render_template('admin_manage_course.html', course=course, modules=modules)
 
@@ -1346,10 +3137,165 @@ def admin_delete_module(module_id):
     UserModuleProgress.query.filter_by(module_id=module_id).delete()
     
     db.session.delete(module)
+    db.session.flush()
+    
+    # Completed counts and totals both change for this course
+    reconcile_course_progress(course_id)
     db.session.commit()
     flash('Module deleted!', 'success')
     
-    return redirect(url_for('admin_manage_course', course_id=course_id))
+    return redirect(url_for('admin_manage_course', course_id=course_id))
+
+# Helper function to create module progress rows on enrollment
+def create_module_progress(course_id, user_ids):
+    """
+    Create not_started progress rows for every module of a course
+    
+    Uses a single INSERT ... SELECT, so the cost does not grow with the number
+    of modules or users in round trips. The caller commits.
+    
+    Args:
+        course_id: course whose modules get progress rows
+        user_ids: users being enrolled
+    """
+    user_ids = list(user_ids)
+    if not user_ids:
+        return
+    
+    modules_for_users = db.select(
+        TYI.id, CourseModule.id, db.literal('not_started')
+    ).join(
+        CourseModule, CourseModule.course_id == course_id
+    ).where(TYI.id.in_(user_ids))
+    
+    db.session.execute(
+        db.insert(UserModuleProgress).from_select(['user_id', 'module_id', 'status'], modules_for_users)
+    )
+
+# Helper function to load modules with a user's progress
+def module_progress_query(user_id, course_ids):
+    """Modules of the courses outer-joined to the user's progress rows, used by load_module_progress"""
+    return db.select(CourseModule, UserModuleProgress).outerjoin(
+        UserModuleProgress,
+        db.and_(
+            UserModuleProgress.module_id == CourseModule.id,
+            UserModuleProgress.user_id == user_id
+        )
+    ).filter(
+        CourseModule.course_id.in_(course_ids)
+    ).order_by(
+        CourseModule.course_id, CourseModule.module_number, CourseModule.id, UserModuleProgress.id
+    )
+
+
+def load_module_progress(user_id, course_ids):
+    """
+    Load the modules of several courses together with one user's progress rows
+
+    Args:
+        user_id: the user whose UserModuleProgress rows are joined in
+        course_ids: iterable of course ids to load modules for
+
+    Returns:
+        dict: course_id -> list of {'module', 'progress'} ordered by module_number.
+        'progress' is None when the user has no row for that module.
+    """
+    course_ids = list(course_ids)
+    modules_by_course = {course_id: [] for course_id in course_ids}
+    if not course_ids:
+        return modules_by_course
+
+    rows = db.session.execute(module_progress_query(user_id, course_ids)).all()
+
+    seen_modules = set()
+    for module, progress in rows:
+        # Keep the first progress row per module, like .first() did
+        if module.id in seen_modules:
+            continue
+        seen_modules.add(module.id)
+        modules_by_course[module.course_id].append({
+            'module': module,
+            'progress': progress
+        })
+
+    return modules_by_course
+
+# Admin view models
+# Admin pages are rendered from plain objects built here, with every related
+# row loaded up front and counts done by the database, so a template cannot
+# trigger a lazy load and a page costs the same few queries at any size.
+def load_admin_user_page(cursor=None):
+    """
+    A page of users with their enrollment counts, in two queries
+    
+    Args:
+        cursor: ?cursor= from the previous page, None for the first page
+    
+    Returns:
+        KeysetPage: UserSummary items with created_at and course_count
+    """
+    page = keyset_page(db.session.query(TYI.id, TYI.firstname, TYI.lastname, TYI.email, TYI.created_at), [TYI.id], cursor)
+    course_counts = dict(db.session.query(
+        UserCourse.user_id, db.func.count(UserCourse.id)
+    ).filter(
+        UserCourse.user_id.in_([row.id for row in page.items])
+    ).group_by(UserCourse.user_id).all())
+    
+    page.items = [UserSummary(**row._asdict(), course_count=course_counts.get(row.id, 0)) for row in page.items]
+    return page
+
+
+def load_admin_application_page(cursor=None):
+    """A page of applications, newest first, with each applicant joined into the same query"""
+    page = keyset_page(Application.query.options(db.joinedload(Application.user)), [Application.created_at, Application.id], cursor)
+    page.items = [
+        snapshot_row(application, user=UserSummary(
+            id=application.user.id, firstname=application.user.firstname,
+            lastname=application.user.lastname, email=application.user.email
+        ))
+        for application in page.items
+    ]
+    return page
+
+
+def load_admin_opportunities():
+    """Every opportunity with its number of applications from one COUNT ... GROUP BY"""
+    application_counts = dict(db.session.query(
+        Application.opportunity_id, db.func.count(Application.id)
+    ).group_by(Application.opportunity_id).all())
+    return [
+        snapshot_row(opportunity, application_count=application_counts.get(opportunity.id, 0))
+        for opportunity in ApplicationOpportunity.query.all()
+    ]
+
+
+def load_admin_user_progress(user_id):
+    """
+    One user's enrollments and per-module progress, in three queries
+    
+    Returns:
+        tuple: (UserSummary, list of {'enrollment', 'modules'}) with the
+        enrollment's course and each module's progress row already attached.
+        Aborts with 404 if the user does not exist.
+    """
+    user = TYI.query.get_or_404(user_id)
+    enrollments = UserCourse.query.options(db.joinedload(UserCourse.course)).filter_by(user_id=user_id).all()
+    modules_by_course = load_module_progress(user_id, {enrollment.course_id for enrollment in enrollments})
+    progress_data = []
+    for enrollment in enrollments:
+        progress_data.append({
+            'enrollment': snapshot_row(enrollment, course=snapshot_row(enrollment.course)),
+            'modules': [
+                {
+                    'module': snapshot_row(item['module']),
+                    'progress': snapshot_row(item['progress']) if item['progress'] else None
+                }
+                for item in modules_by_course[enrollment.course_id]
+            ]
+        })
+    
+    summary = UserSummary(id=user.id, firstname=user.firstname, lastname=user.lastname, email=user.email)
+    return summary, progress_data
 
 # Admin - Progress Management
 @app.route('/admin/progress')
@@ -1357,8 +3303,15 @@ def admin_progress():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    users = TYI.query.all()
-    return render_template('admin_progress.html', users=users)
+    return render_template('admin_progress.html', users=load_admin_user_page())
+
+@app.route('/admin/progress/more')
+def admin_progress_more():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    users = load_admin_user_page(request.args.get('cursor'))
+    return load_more_response('partials/admin_progress_users.html', users)
 
 # Admin - View User Progress
 @app.route('/admin/progress/user/<int:user_id>')
@@ -1366,31 +3319,7 @@ def admin_user_progress(user_id):
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    user = TYI.query.get_or_404(user_id)
-    enrollments = UserCourse.query.filter_by(user_id=user_id).all()
-    
-    # Get detailed progress for each enrollment
-    progress_data = []
-    for enrollment in enrollments:
-        modules = CourseModule.query.filter_by(course_id=enrollment.course_id).order_by(CourseModule.module_number).all()
-        module_progress = []
-        
-        for module in modules:
-            user_module = UserModuleProgress.query.filter_by(
-                user_id=user_id,
-                module_id=module.id
-            ).first()
-            
-            module_progress.append({
-                'module': module,
-                'progress': user_module
-            })
-        
-        progress_data.append({
-            'enrollment': enrollment,
-            'modules': module_progress
-        })
-    
+    user, progress_data = load_admin_user_progress(user_id)
     return render_template('admin_user_progress.html', user=user, progress_data=progress_data)
 
 # Admin - Update Module Progress
@@ -1401,6 +3330,7 @@ def admin_update_module_progress(progress_id):
     
     progress = UserModuleProgress.query.get_or_404(progress_id)
     new_status = request.form.get('status')
+    was_completed = progress.status == 'completed'
     
     progress.status = new_status
     
@@ -1409,49 +3339,91 @@ def admin_update_module_progress(progress_id):
     elif new_status == 'completed':
         progress.completed_at = datetime.now(KIGALI_TZ)
     
-    db.session.commit()
+    # Move the course counters in the same transaction as the status change
+    completed_delta = int(new_status == 'completed') - int(was_completed)
+    if completed_delta:
+        adjust_course_progress(progress.user_id, progress.module_id, completed_delta)
     
-    # Recalculate course progress
-    update_course_progress(progress.module.course_id, UserModuleProgress.query.filter_by(module_id=progress.module_id).first().user_id)
+    db.session.commit()
     
     flash('Module progress updated!', 'success')
     return redirect(request.referrer)
 
-# Helper function to update course progress
-def update_course_progress(course_id, user_id):
-    user_course = UserCourse.query.filter_by(user_id=user_id, course_id=course_id).first()
+# Admin - Set Module Progress for a module the user has no progress row for yet
+@app.route('/admin/progress/user/<int:user_id>/module/<int:module_id>/update', methods=['POST'])
+def admin_set_module_progress(user_id, module_id):
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
     
-    if not user_course:
-        return
+    CourseModule.query.get_or_404(module_id)
+    progress = UserModuleProgress.query.filter_by(user_id=user_id, module_id=module_id).first()
+    if not progress:
+        progress = UserModuleProgress(user_id=user_id, module_id=module_id, status='not_started')
+        db.session.add(progress)
+        db.session.commit()
     
-    # Get total modules
-    total_modules = CourseModule.query.filter_by(course_id=course_id).count()
+    return admin_update_module_progress(progress.id)
+
+# Helper functions to keep course progress counters
+def _course_progress_values(completed_modules, total_modules):
+    """UserCourse column values for a completed/total module count given as SQL expressions"""
+    is_complete = db.and_(total_modules > 0, completed_modules >= total_modules)
+    return {
+        'completed_modules': completed_modules,
+        'progress_percentage': db.case((total_modules > 0, completed_modules * 100 // total_modules), else_=0),
+        'status': db.case((is_complete, 'completed'), else_='in_progress'),
+        'completed_at': db.case(
+            (is_complete, db.func.coalesce(UserCourse.completed_at, datetime.now(KIGALI_TZ))),
+            else_=UserCourse.completed_at
+        )
+    }
+
+def _course_module_count():
+    return db.select(db.func.count(CourseModule.id)).where(
+        CourseModule.course_id == UserCourse.course_id
+    ).scalar_subquery()
+
+def adjust_course_progress(user_id, module_id, completed_delta):
+    """
+    Move a user's course counters by the number of modules newly completed (or un-completed)
     
-    # Get completed modules for this user
-    completed_modules = db.session.query(UserModuleProgress).join(CourseModule).filter(
-        CourseModule.course_id == course_id,
-        UserModuleProgress.user_id == user_id,
-        UserModuleProgress.status == 'completed'
-    ).count()
+    A single UPDATE adjusts completed_modules, progress_percentage and status
+    without recounting the user's progress rows. The caller commits, so the
+    counters change in the same transaction as the module status.
+    """
+    completed_modules = db.func.coalesce(UserCourse.completed_modules, 0) + completed_delta
+    module_course = db.select(CourseModule.course_id).where(CourseModule.id == module_id).scalar_subquery()
     
-    # Calculate progress
-    if total_modules > 0:
-        progress_percentage = int((completed_modules / total_modules) * 100)
-    else:
-        progress_percentage = 0
+    db.session.execute(
+        db.update(UserCourse)
+        .where(UserCourse.user_id == user_id, UserCourse.course_id == module_course)
+        .values(**_course_progress_values(completed_modules, _course_module_count()))
+    )
+
+def reconcile_course_progress(course_id=None):
+    """
+    Recompute every enrollment's counters from the progress rows to repair drift
     
-    # Update UserCourse
-    user_course.completed_modules = completed_modules
-    user_course.progress_percentage = progress_percentage
+    Args:
+        course_id: limit the repair to one course, all courses when None
     
-    # Mark as completed if all modules done
-    if completed_modules == total_modules and total_modules > 0:
-        user_course.status = 'completed'
-        user_course.completed_at = datetime.now(KIGALI_TZ)
-    else:
-        user_course.status = 'in_progress'
+    Returns:
+        int: number of enrollments updated. The caller commits.
+    """
+    completed_modules = db.select(
+        db.func.count(db.distinct(UserModuleProgress.module_id))
+    ).join(
+        CourseModule, CourseModule.id == UserModuleProgress.module_id
+    ).where(
+        UserModuleProgress.user_id == UserCourse.user_id,
+        CourseModule.course_id == UserCourse.course_id,
+        UserModuleProgress.status == 'completed'
+    ).scalar_subquery()
     
-    db.session.commit()
+    statement = db.update(UserCourse).values(**_course_progress_values(completed_modules, _course_module_count()))
+    if course_id is not None:
+        statement = statement.where(UserCourse.course_id == course_id)
+    return db.session.execute(statement).rowcount
 
 # Admin - Application Opportunities
 @app.route('/admin/opportunity/create', methods=['POST'])
@@ -1465,35 +3437,32 @@ def admin_create_opportunity():
     deadline_str = request.form.get('deadline')
     prize_amount = request.form.get('prize_amount')
     
-    # Handle image upload
-    cover_image_url = 'new.png'  # Default fallback
-    if 'cover_image' in request.files:
-        file = request.files['cover_image']
-        if file.filename != '':
-            uploaded_url = upload_image_to_cloudinary(file, folder='tegura/opportunities')
-            if uploaded_url:
-                cover_image_url = uploaded_url
-                print(f"✅ Image uploaded: {uploaded_url}")
-            else:
-                flash('Image upload failed, using default image.', 'warning')
-    
     # Parse deadline
     deadline = datetime.strptime(deadline_str, '%Y-%m-%d')
     
+    # Saved with the default image, the upload swaps in the Cloudinary URL
     new_opportunity = ApplicationOpportunity(
         title=title,
         description=description,
         requirements=requirements,
         deadline=deadline,
         prize_amount=prize_amount,
-        cover_image=cover_image_url,  # Store Cloudinary URL
+        cover_image='new.png',
         status='open'
     )
     
     db.session.add(new_opportunity)
     db.session.commit()
+    content_cache.invalidate('opportunities')
     flash(f'Opportunity "{title}" created!', 'success')
     
+    # Handle image upload
+    file = request.files.get('cover_image')
+    if file and file.filename != '':
+        cover_uploads.submit(file, ApplicationOpportunity, new_opportunity.id, 'new.png',
+                             folder='tegura/opportunities', cache_name='opportunities')
+        flash('Cover image is uploading and will appear shortly.', 'info')
+    
     return redirect(url_for('admin_portal'))
 
 # Admin - View Applications
@@ -1502,10 +3471,18 @@ def admin_applications():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    applications = Application.query.order_by(Application.created_at.desc()).all()
-    opportunities = ApplicationOpportunity.query.all()
+    return render_template('admin_applications.html',
+                         applications=load_admin_application_page(),
+                         application_count=Application.query.count(),
+                         opportunities=load_admin_opportunities())
+
+@app.route('/admin/applications/more')
+def admin_applications_more():
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
     
-    return render_template('admin_applications.html', applications=applications, opportunities=opportunities)
+    applications = load_admin_application_page(request.args.get('cursor'))
+    return load_more_response('partials/admin_application_cards.html', applications)
 
 # Admin - Update Application Status
 @app.route('/admin/application/<int:app_id>/update', methods=['POST'])
@@ -1557,19 +3534,7 @@ def view_course(course_id):
         return redirect(url_for('education'))
     
     # Get modules with user progress
-    modules = CourseModule.query.filter_by(course_id=course_id).order_by(CourseModule.module_number).all()
-    modules_with_progress = []
-    
-    for module in modules:
-        progress = UserModuleProgress.query.filter_by(
-            user_id=current_user.id,
-            module_id=module.id
-        ).first()
-        
-        modules_with_progress.append({
-            'module': module,
-            'progress': progress
-        })
+    modules_with_progress = load_module_progress(current_user.id, [course_id])[course_id]
     
     return render_template('course_detail.html', course=course, enrollment=enrollment, modules=modules_with_progress)
 
@@ -1592,6 +3557,11 @@ def view_module(course_id, module_id):
         module_id=module_id
     ).first()
     
+    # In lazy mode the row is created the first time the module is opened
+    if not progress and app.config['MODULE_PROGRESS_MODE'] == 'lazy':
+        progress = UserModuleProgress(user_id=current_user.id, module_id=module_id, status='not_started')
+        db.session.add(progress)
+    
     # Mark as in_progress if not started
     if progress and progress.status == 'not_started':
         progress.status = 'in_progress'
@@ -1604,7 +3574,7 @@ def view_module(course_id, module_id):
 @app.route('/opportunities')
 @login_required
 def opportunities():
-    open_opportunities = ApplicationOpportunity.query.filter_by(status='open').all()
+    open_opportunities = load_open_opportunities()
     user_applications = Application.query.filter_by(user_id=current_user.id).all()
     
     return render_template('opportunities.html', opportunities=open_opportunities, user_applications=user_applications)
@@ -1674,6 +3644,7 @@ def admin_create_event():
     
     db.session.add(new_event)
     db.session.commit()
+    content_cache.invalidate('events')
     flash(f'Event "{title}" created!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1687,6 +3658,7 @@ def admin_delete_event(event_id):
     event = Event.query.get_or_404(event_id)
     db.session.delete(event)
     db.session.commit()
+    content_cache.invalidate('events')
     flash('Event deleted!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1703,34 +3675,31 @@ def admin_create_blog():
     youtube_url = request.form.get('youtube_url')
     publish_date_str = request.form.get('publish_date')
     
-    # Handle image upload
-    cover_image_url = '5.jpg'  # Default fallback
-    if 'cover_image' in request.files:
-        file = request.files['cover_image']
-        if file.filename != '':
-            uploaded_url = upload_image_to_cloudinary(file, folder='tegura/blogs')
-            if uploaded_url:
-                cover_image_url = uploaded_url
-                print(f"✅ Blog image uploaded: {uploaded_url}")
-            else:
-                flash('Image upload failed, using default image.', 'warning')
-    
     # Parse date
     publish_date = datetime.strptime(publish_date_str, '%Y-%m-%d')
     
+    # Saved with the default image, the upload swaps in the Cloudinary URL
     new_blog = BlogPost(
         title=title,
         author=author,
         description=description,
         youtube_url=youtube_url,
-        cover_image=cover_image_url,  # Store Cloudinary URL
+        cover_image='5.jpg',
         publish_date=publish_date
     )
     
     db.session.add(new_blog)
     db.session.commit()
+    content_cache.invalidate('blogs')
     flash(f'Blog post "{title}" created!', 'success')
     
+    # Handle image upload
+    file = request.files.get('cover_image')
+    if file and file.filename != '':
+        cover_uploads.submit(file, BlogPost, new_blog.id, '5.jpg',
+                             folder='tegura/blogs', cache_name='blogs')
+        flash('Cover image is uploading and will appear shortly.', 'info')
+    
     return redirect(url_for('admin_portal'))
 
 # Admin - Delete Blog Post
@@ -1742,6 +3711,7 @@ def admin_delete_blog(blog_id):
     blog = BlogPost.query.get_or_404(blog_id)
     db.session.delete(blog)
     db.session.commit()
+    content_cache.invalidate('blogs')
     flash('Blog post deleted!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1766,6 +3736,7 @@ def admin_create_activity():
     
     db.session.add(new_activity)
     db.session.commit()
+    content_cache.invalidate('activities')
     flash(f'Activity update "{title}" created!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1779,6 +3750,7 @@ def admin_delete_activity(activity_id):
     activity = ActivityUpdate.query.get_or_404(activity_id)
     db.session.delete(activity)
     db.session.commit()
+    content_cache.invalidate('activities')
     flash('Activity update deleted!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1793,6 +3765,7 @@ def admin_update_opportunity(opp_id):
     opportunity.cover_image = request.form.get('cover_image', 'new.png')
     
     db.session.commit()
+    content_cache.invalidate('opportunities')
     flash('Opportunity updated!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1810,10 +3783,104 @@ def admin_delete_opportunity(opp_id):
     
     db.session.delete(opportunity)
     db.session.commit()
+    content_cache.invalidate('opportunities')
     flash('Opportunity deleted!', 'success')
     
     return redirect(url_for('admin_portal'))
 
+# Helper function to import leaderboard CSV rows in chunks
+LEADERBOARD_IMPORT_CHUNK_SIZE = 1000
+
+def import_leaderboard_rows(csv_reader, chunk_size=LEADERBOARD_IMPORT_CHUNK_SIZE):
+    """
+    Create or update leaderboard entries from parsed CSV rows
+    
+    Rows are read in chunks. Each chunk resolves its emails with one IN query,
+    looks up existing entries with another, then writes updates and inserts
+    as two bulk statements. The caller commits.
+    
+    Args:
+        csv_reader: csv.DictReader with rank, user_email, total_points, project_name, location
+        chunk_size: number of rows resolved per round trip
+    
+    Returns:
+        dict: created and updated counts, not_found_users and per-row errors
+    """
+    result = {'created': 0, 'updated': 0, 'not_found_users': [], 'errors': []}
+    chunk = []
+    
+    for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
+        try:
+            # Get and validate data
+            chunk.append({
+                'user_email': row['user_email'].strip(),
+                'rank': int(row['rank'].strip()),
+                'total_points': int(row['total_points'].strip()),
+                'project_name': row['project_name'].strip(),
+                'location': row['location'].strip()
+            })
+        except ValueError as e:
+            result['errors'].append(f"Row {row_num}: Invalid number format - {str(e)}")
+        except KeyError as e:
+            result['errors'].append(f"Row {row_num}: Missing column - {str(e)}")
+        except Exception as e:
+            result['errors'].append(f"Row {row_num}: {str(e)}")
+        
+        if len(chunk) >= chunk_size:
+            _import_leaderboard_chunk(chunk, result)
+            chunk = []
+    
+    if chunk:
+        _import_leaderboard_chunk(chunk, result)
+    
+    return result
+
+def _import_leaderboard_chunk(chunk, result):
+    emails = {row['user_email'] for row in chunk}
+    user_ids = dict(db.session.execute(
+        db.select(TYI.email, TYI.id).where(TYI.email.in_(emails))
+    ).all())
+    
+    existing = {}
+    for entry_id, user_id in db.session.execute(
+        db.select(LeaderboardEntry.id, LeaderboardEntry.user_id)
+        .where(LeaderboardEntry.user_id.in_(set(user_ids.values())))
+        .order_by(LeaderboardEntry.id.desc())
+    ):
+        # Keep the oldest entry per user, like .first() did
+        existing[user_id] = entry_id
+    
+    updates = {}
+    inserts = {}
+    for row in chunk:
+        user_id = user_ids.get(row['user_email'])
+        if user_id is None:
+            result['not_found_users'].append(row['user_email'])
+            continue
+        
+        values = {
+            'rank': row['rank'],
+            'total_points': row['total_points'],
+            'project_name': row['project_name'],
+            'location': row['location']
+        }
+        
+        # A later row for the same user overwrites the earlier one
+        if user_id in existing:
+            updates[user_id] = dict(values, id=existing[user_id])
+            result['updated'] += 1
+        elif user_id in inserts:
+            inserts[user_id].update(values)
+            result['updated'] += 1
+        else:
+            inserts[user_id] = dict(values, user_id=user_id)
+            result['created'] += 1
+    
+    if updates:
+        db.session.execute(db.update(LeaderboardEntry), list(updates.values()))
+    if inserts:
+        db.session.execute(db.insert(LeaderboardEntry), list(inserts.values()))
+
 # Admin - Upload Leaderboard CSV
 @app.route('/admin/leaderboard/upload', methods=['POST'])
 def admin_upload_leaderboard():
@@ -1834,76 +3901,31 @@ def admin_upload_leaderboard():
         flash('Please upload a CSV file!', 'danger')
         return redirect(url_for('admin_portal'))
     
+    csv_file = None
     try:
         import csv
         import io
         
-        # Read the file content
-        content = file.read().decode('utf-8-sig')  # utf-8-sig handles BOM
-        
-        # Create StringIO object
-        csv_file = io.StringIO(content)
+        # Stream the upload instead of reading it all into memory
+        csv_file = io.TextIOWrapper(file.stream, encoding='utf-8-sig', newline='')  # utf-8-sig handles BOM
         
         # Read CSV
         csv_reader = csv.DictReader(csv_file)
         
         # Verify headers
         expected_headers = {'rank', 'user_email', 'total_points', 'project_name', 'location'}
-        if not expected_headers.issubset(set(csv_reader.fieldnames)):
+        if not expected_headers.issubset(set(csv_reader.fieldnames or [])):
             flash(f'CSV must have headers: rank, user_email, total_points, project_name, location', 'danger')
             return redirect(url_for('admin_portal'))
         
-        updated_count = 0
-        created_count = 0
-        not_found_users = []
-        errors = []
-        
-        for row_num, row in enumerate(csv_reader, start=2):  # Start at 2 because row 1 is header
-            try:
-                # Get and validate data
-                user_email = row['user_email'].strip()
-                rank = int(row['rank'].strip())
-                total_points = int(row['total_points'].strip())
-                project_name = row['project_name'].strip()
-                location = row['location'].strip()
-                
-                # Find user by email
-                user = TYI.query.filter_by(email=user_email).first()
-                
-                if not user:
-                    not_found_users.append(user_email)
-                    continue
-                
-                # Check if leaderboard entry exists
-                leaderboard_entry = LeaderboardEntry.query.filter_by(user_id=user.id).first()
-                
-                if leaderboard_entry:
-                    # Update existing entry
-                    leaderboard_entry.rank = rank
-                    leaderboard_entry.total_points = total_points
-                    leaderboard_entry.project_name = project_name
-                    leaderboard_entry.location = location
-                    updated_count += 1
-                else:
-                    # Create new entry
-                    new_entry = LeaderboardEntry(
-                        user_id=user.id,
-                        rank=rank,
-                        total_points=total_points,
-                        project_name=project_name,
-                        location=location
-                    )
-                    db.session.add(new_entry)
-                    created_count += 1
-                    
-            except ValueError as e:
-                errors.append(f"Row {row_num}: Invalid number format - {str(e)}")
-            except KeyError as e:
-                errors.append(f"Row {row_num}: Missing column - {str(e)}")
-            except Exception as e:
-                errors.append(f"Row {row_num}: {str(e)}")
+        result = import_leaderboard_rows(csv_reader)
+        created_count = result['created']
+        updated_count = result['updated']
+        not_found_users = result['not_found_users']
+        errors = result['errors']
         
         db.session.commit()
+        content_cache.invalidate('leaderboard')
         
         # Build success message
         message = f'✅ Leaderboard updated! {created_count} created, {updated_count} updated.'
@@ -1923,6 +3945,10 @@ def admin_upload_leaderboard():
     except Exception as e:
         db.session.rollback()
         flash(f'Error processing CSV: {str(e)}', 'danger')
+    finally:
+        if csv_file is not None:
+            # Leave closing the upload to Werkzeug
+            csv_file.detach()
     
     return redirect(url_for('admin_portal'))
 
@@ -1934,6 +3960,7 @@ def admin_clear_leaderboard():
     
     LeaderboardEntry.query.delete()
     db.session.commit()
+    content_cache.invalidate('leaderboard')
     flash('Leaderboard cleared!', 'success')
     
     return redirect(url_for('admin_portal'))
@@ -1944,16 +3971,1116 @@ def admin_leaderboard():
     if not session.get('admin_logged_in'):
         return redirect(url_for('admin_login'))
     
-    entries = LeaderboardEntry.query.order_by(LeaderboardEntry.rank).all()
+    entries = load_leaderboard().entries
     return render_template('admin_leaderboard.html', entries=entries)
 
 
-with app.app_context():
+# Database maintenance commands
+@app.cli.command('create-indexes')
+def create_indexes_command():
+    """Create any model indexes missing from an existing database.
+
+    db.create_all() skips tables that already exist, so indexes added to the
+    models after a table was created have to be added here.
+    """
+    for table in db.metadata.sorted_tables:
+        for index in sorted(table.indexes, key=lambda ix: ix.name):
+            index.create(bind=db.engine, checkfirst=True)
+            print(f"✅ {table.name}: {index.name}")
+
+
+@app.route('/admin/db-pool')
+def admin_db_pool():
+    """Connection pool usage and checkout wait times for sizing the pool"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    pool = db.engine.pool
+    stats = {
+        'pool_class': type(pool).__name__,
+        'status': pool.status(),
+        'checkout_wait': pool_checkout_wait.snapshot()
+    }
+    if isinstance(pool, QueuePool):
+        stats.update({
+            'size': pool.size(),
+            'checked_out': pool.checkedout(),
+            'overflow': pool.overflow(),
+            'checked_in': pool.checkedin()
+        })
+    return jsonify(stats)
+
+
+@app.route('/admin/performance')
+def admin_performance():
+    """Per-endpoint latency, query counts and time breakdown for this worker's recent requests"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    return render_template('admin_performance.html',
+                         endpoints=endpoint_timings.summary(),
+                         window=endpoint_timings.window)
+
+
+@app.route('/admin/uploads')
+def admin_uploads():
+    """The 50 most recent cover image uploads from every worker, newest first"""
+    if not session.get('admin_logged_in'):
+        return redirect(url_for('admin_login'))
+    
+    jobs = db.session.scalars(db.select(CoverUpload).order_by(CoverUpload.id.desc()).limit(50)).all()
+    return jsonify([{
+        'id': job.id,
+        'table': job.table_name,
+        'record_id': job.record_id,
+        'filename': job.filename,
+        'bytes': job.size_bytes,
+        'status': job.status,
+        'url': job.url,
+        'error': job.error,
+        'queued_at': job.queued_at.isoformat(),
+        'finished_at': job.finished_at.isoformat() if job.finished_at else None
+    } for job in jobs])
+
+
+@app.cli.command('reconcile-course-progress')
+@click.option('--course-id', type=int, default=None, help='Only repair this course')
+def reconcile_course_progress_command(course_id):
+    """Recompute course progress counters from module progress rows"""
+    updated = reconcile_course_progress(course_id)
+    db.session.commit()
+    print(f"✅ Reconciled {updated} enrollments")
+
+
+@app.cli.command('process-outbox')
+def process_outbox_command():
+    """Deliver queued emails in the foreground, for a dedicated worker process"""
+    if email_outbox.workers <= 0:
+        email_outbox.workers = 1
+    email_outbox.start()
+    print(f"📤 Delivering outbox with {email_outbox.workers} workers, Ctrl+C to stop")
     try:
-        db.create_all()
-        print("✅ Database tables initialized successfully!")
-    except Exception as e:
-        print(f"⚠️ Database initialization info: {str(e)}")
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        email_outbox.stop()
+
+
+@app.cli.command('send-announcement')
+@click.option('--subject', required=True, help='Email subject')
+@click.option('--html-file', required=True, type=click.File('r'), help='File with the HTML body')
+@click.option('--include-unverified', is_flag=True, help='Also email users who have not verified their address')
+def send_announcement_command(subject, html_file, include_unverified):
+    """Email one announcement to the whole cohort in batched API calls"""
+    query = db.select(TYI.email).order_by(TYI.id)
+    if not include_unverified:
+        query = query.filter_by(email_verified=True)
+    recipients = list(db.session.scalars(query))
+    if not recipients:
+        print("⚠️ No recipients")
+        return
+    
+    transport = get_email_transport()
+    calls = transport.send_bulk(recipients, subject, html_file.read())
+    print(f"✅ Sent to {len(recipients)} users in {calls} API calls {transport.metrics.snapshot()}")
+
+
+@app.cli.command('sendgrid-mock')
+@click.option('--port', default=8025, help='Port to listen on')
+def sendgrid_mock_command(port):
+    """Run a local stand-in for the SendGrid API, use with SENDGRID_API_HOST=http://127.0.0.1:<port>"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MockSendGridHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+            if self.path != '/v3/mail/send':
+                status = 404
+            else:
+                payload = json.loads(body or b'{}')
+                recipients = [to['email'] for p in payload.get('personalizations', []) for to in p.get('to', [])]
+                print(f"📨 {payload.get('subject')!r} to {len(recipients)} recipients")
+                status = 202
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"📡 Mock SendGrid listening on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(('127.0.0.1', port), MockSendGridHandler).serve_forever()
+
+
+@app.cli.command('cloudinary-mock')
+@click.option('--port', default=8026, help='Port to listen on')
+@click.option('--delay', default=0.0, help='Seconds to wait before answering each request, to mimic a slow uplink')
+def cloudinary_mock_command(port, delay):
+    """Run a local stand-in for the Cloudinary upload API, use with CLOUDINARY_UPLOAD_PREFIX=http://127.0.0.1:<port>"""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MockCloudinaryHandler(BaseHTTPRequestHandler):
+        protocol_version = 'HTTP/1.1'
+
+        def do_POST(self):
+            length = int(self.headers.get('Content-Length', 0))
+            self.rfile.read(length)
+            time.sleep(delay)
+            
+            # /v1_1/<cloud_name>/image/upload
+            parts = self.path.strip('/').split('/')
+            if len(parts) != 4 or parts[3] != 'upload':
+                self.send_response(404)
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            
+            # Chunks of one upload share X-Unique-Upload-Id
+            public_id = self.headers.get('X-Unique-Upload-Id') or uuid.uuid4().hex
+            content_range = self.headers.get('Content-Range')
+            print(f"🖼️ {public_id}: {content_range or f'{length} bytes'}")
+            body = json.dumps({
+                'public_id': public_id,
+                'secure_url': f"http://127.0.0.1:{port}/{parts[1]}/image/upload/{public_id}.jpg",
+                'bytes': length
+            }).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    print(f"📡 Mock Cloudinary listening on http://127.0.0.1:{port}")
+    ThreadingHTTPServer(('127.0.0.1', port), MockCloudinaryHandler).serve_forever()
+
+
+@app.cli.command('build-images')
+@click.option('--force', is_flag=True, help='Rebuild derivatives even if the original has not changed')
+def build_images_command(force):
+    """Write AVIF/WebP derivatives of static/images and report the bytes saved per page"""
+    try:
+        from PIL import Image
+    except ImportError:
+        print("❌ build-images needs Pillow: pip install Pillow")
+        return
+    
+    global _image_manifest
+    source_dir = os.path.join(app.static_folder, 'images')
+    derived_dir = os.path.join(app.static_folder, IMAGE_DERIVED_DIR)
+    os.makedirs(derived_dir, exist_ok=True)
+    old_manifest = image_manifest()
+    manifest = {}
+    
+    for name in sorted(os.listdir(source_dir)):
+        path = os.path.join(source_dir, name)
+        if not os.path.isfile(path) or not name.lower().endswith(('.png', '.jpg', '.jpeg')):
+            continue
+        with open(path, 'rb') as f:
+            digest = hashlib.sha256(f.read()).hexdigest()[:16]
+        if not force and old_manifest.get(name, {}).get('sha256') == digest:
+            manifest[name] = old_manifest[name]
+            continue
+        
+        with Image.open(path) as original:
+            image = original.convert('RGBA' if 'A' in original.getbands() else 'RGB')
+        widths = [w for w in IMAGE_WIDTHS if w < image.width] + [min(image.width, IMAGE_WIDTHS[-1])]
+        stem = secure_filename(os.path.splitext(name)[0])
+        entry = {'width': image.width, 'height': image.height, 'bytes': os.path.getsize(path),
+                 'sha256': digest, 'variants': {}}
+        for fmt, _, options in IMAGE_FORMATS:
+            variants = []
+            for width in widths:
+                height = round(image.height * width / image.width)
+                derived_name = f'{stem}-{width}.{digest[:8]}.{fmt}'
+                derived_path = os.path.join(derived_dir, derived_name)
+                image.resize((width, height), Image.LANCZOS).save(derived_path, fmt.upper(), **options)
+                variants.append([width, derived_name, os.path.getsize(derived_path)])
+            entry['variants'][fmt] = variants
+        manifest[name] = entry
+        print(f"🖼️ {name}: {len(widths)} widths")
+    
+    # Drop derivatives of images that were changed or removed
+    keep = {v[1] for entry in manifest.values() for variants in entry['variants'].values() for v in variants}
+    for name in os.listdir(derived_dir):
+        if name != 'manifest.json' and name not in keep:
+            os.remove(os.path.join(derived_dir, name))
+    
+    with open(os.path.join(derived_dir, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    _image_manifest = manifest
+    print(f"✅ {len(manifest)} images in {IMAGE_DERIVED_DIR}/manifest.json")
+    
+    print("Page weight on a 412px phone at 2x:")
+    for page, (original, responsive) in image_savings_report().items():
+        saved = original - responsive
+        ratio = original / responsive if responsive else 0
+        print(f"  {page}: {original // 1024} KB -> {responsive // 1024} KB, {saved // 1024} KB saved ({ratio:.1f}x smaller)")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Hash every static file into assets.json and write .br/.gz copies of text assets"""
+    global asset_manifest, hashed_assets
+    try:
+        import brotli
+    except ImportError:
+        brotli = None
+        print("⚠️ Brotli not installed, writing .gz only: pip install Brotli")
+    
+    manifest = {}
+    saved = 0
+    for root, dirs, files in os.walk(app.static_folder):
+        for name in sorted(files):
+            path = os.path.join(root, name)
+            filename = os.path.relpath(path, app.static_folder).replace(os.sep, '/')
+            if filename == ASSET_MANIFEST or name.endswith(('.br', '.gz')):
+                continue
+            if filename.startswith(FINGERPRINTED_DIRS) and filename.endswith('manifest.json'):
+                continue
+            
+            with open(path, 'rb') as f:
+                content = f.read()
+            digest = hashlib.sha256(content).hexdigest()
+            entry = {'bytes': len(content), 'sha256': digest}
+            entry['hashed'] = filename if filename.startswith(FINGERPRINTED_DIRS) else hashed_asset_name(filename, digest)
+            
+            if name.endswith(COMPRESSIBLE_EXTENSIONS):
+                entry['compressed'] = {}
+                variants = [('.gz', gzip.compress(content, compresslevel=9, mtime=0))]
+                if brotli:
+                    variants.append(('.br', brotli.compress(content, quality=11)))
+                for suffix, body in variants:
+                    if len(body) < len(content):
+                        with open(path + suffix, 'wb') as f:
+                            f.write(body)
+                        entry['compressed'][suffix] = len(body)
+                if entry['compressed']:
+                    smallest = min(entry['compressed'].values())
+                    saved += len(content) - smallest
+                    print(f"🗜️ {filename}: {len(content) // 1024} KB -> {smallest // 1024} KB")
+            manifest[filename] = entry
+    
+    with open(os.path.join(app.static_folder, ASSET_MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    asset_manifest, hashed_assets = load_asset_manifest()
+    print(f"✅ {len(manifest)} static files in {ASSET_MANIFEST}, {saved // 1024} KB saved by precompression")
+
+
+@app.cli.command('retry-dead-emails')
+def retry_dead_emails_command():
+    """Move dead-lettered emails back into the outbox"""
+    retried = EmailOutbox.query.filter_by(status='dead').update({
+        'status': 'pending',
+        'attempts': 0,
+        'next_attempt_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    print(f"✅ {retried} emails queued for another try")
+
+
+# Representative queries issued by each route, used by check-query-plans.
+# Every filtered or ordered lookup a route makes should be listed here so a
+# missing index shows up before it shows up in production latency. Queries
+# built by a helper (user_dashboard_query, ...) are taken from that helper so
+# the check runs exactly what the route runs.
+def _route_query_plans(user_id=1, course_id=1, module_id=1, opp_id=1, token='token'):
+    today = datetime.now(KIGALI_TZ)
+    return {
+        'login': [
+            db.select(TYI).filter_by(email='user@example.com'),
+        ],
+        'verify_email': [
+            db.select(TYI).filter_by(verification_token=token),
+        ],
+        'reset_password': [
+            db.select(TYI).filter_by(reset_token=token),
+        ],
+        'home': [
+            user_dashboard_query(user_id),
+            open_opportunities_query(),
+            upcoming_events_query(),
+            published_blogs_query(),
+            recent_activities_query(),
+        ],
+        'enroll_course': [
+            db.select(UserCourse).filter_by(user_id=user_id, course_id=course_id).limit(1),
+            db.select(CourseModule).filter_by(course_id=course_id),
+        ],
+        'application': [
+            db.select(Application).filter_by(user_id=user_id).order_by(Application.created_at.desc()).limit(1),
+        ],
+        'leaderboard': [
+            db.select(LeaderboardEntry, TYI.email).outerjoin(TYI, TYI.id == LeaderboardEntry.user_id).order_by(LeaderboardEntry.rank, LeaderboardEntry.id),
+        ],
+        'messages': [
+            db.select(Message).filter_by(user_id=user_id).filter(db.tuple_(Message.created_at, Message.id) < db.tuple_(today, 1)).order_by(Message.created_at.desc(), Message.id.desc()).limit(51),
+            db.select(db.func.count()).select_from(Message).filter_by(user_id=user_id, is_read=False),
+        ],
+        'view_course': [
+            db.select(UserCourse).filter_by(user_id=user_id, course_id=course_id).limit(1),
+            module_progress_query(user_id, [course_id]),
+        ],
+        'view_module': [
+            db.select(UserCourse).filter_by(user_id=user_id, course_id=course_id).limit(1),
+            db.select(UserModuleProgress).filter_by(user_id=user_id, module_id=module_id).limit(1),
+        ],
+        'apply_opportunity': [
+            db.select(Application).filter_by(user_id=user_id, opportunity_id=opp_id).limit(1),
+        ],
+        'admin_applications': [
+            db.select(Application).filter(db.tuple_(Application.created_at, Application.id) < db.tuple_(today, 1)).order_by(Application.created_at.desc(), Application.id.desc()).limit(51),
+        ],
+        'admin_delete_course': [
+            db.select(UserCourse).filter_by(course_id=course_id),
+        ],
+        'admin_delete_module': [
+            db.select(UserModuleProgress).filter_by(module_id=module_id),
+        ],
+        'admin_delete_opportunity': [
+            db.select(Application).filter_by(opportunity_id=opp_id),
+        ],
+        'email_outbox': [
+            db.select(EmailOutbox).filter(EmailOutbox.status == 'pending', EmailOutbox.next_attempt_at <= datetime.utcnow()).order_by(EmailOutbox.next_attempt_at).limit(10),
+        ],
+    }
+
+
+def _full_scans_in_plan(connection, statement):
+    """Run EXPLAIN for a statement and return the plan lines that scan a whole table"""
+    # Expand IN (...) parameters, which are otherwise filled in at execution
+    compiled = statement.compile(dialect=connection.dialect, compile_kwargs={'render_postcompile': True})
+    if compiled.positional:
+        params = tuple(compiled.params[name] for name in compiled.positiontup)
+    else:
+        params = compiled.params
+
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {compiled}", params).fetchall()
+        plan = [row[-1] for row in rows]
+        # "SCAN tyi" is a full scan, "SCAN tyi USING INDEX ..." walks an index and
+        # "SCAN CONSTANT ROW" is the outer SELECT of a query made of scalar subqueries
+        return [line for line in plan if line.startswith('SCAN') and 'USING' not in line and line != 'SCAN CONSTANT ROW']
+
+    rows = connection.exec_driver_sql(f"EXPLAIN {compiled}", params).fetchall()
+    plan = [row[0] for row in rows]
+    return [line.strip() for line in plan if 'Seq Scan' in line]
+
+
+@app.cli.command('check-query-plans')
+def check_query_plans_command():
+    """EXPLAIN every route's queries and fail if any of them plans a full table scan"""
+    failures = 0
+    with db.engine.connect() as connection:
+        if connection.dialect.name == 'postgresql':
+            # Small tables are always cheaper to seq scan, so ask the planner
+            # whether an index path exists at all.
+            connection.exec_driver_sql("SET enable_seqscan = off")
+
+        for route, statements in _route_query_plans().items():
+            route_failures = 0
+            for statement in statements:
+                scans = _full_scans_in_plan(connection, statement)
+                if scans:
+                    route_failures += 1
+                    print(f"❌ {route}: {'; '.join(scans)}")
+                    print(f"   {statement}")
+            if not route_failures:
+                print(f"✅ {route}")
+            failures += route_failures
+
+    if failures:
+        print(f"⚠️ {failures} queries plan a full table scan. Run 'flask create-indexes' or add an index.")
+        raise SystemExit(1)
+    print("✅ No full table scans planned")
+
+
+# App setup
+def configure_app():
+    """
+    Bind the extensions and tune the database engine of the module-level app
+    
+    This is one-shot setup, not a factory: routes, models and commands are
+    registered on the single module-level app as this file is imported, so
+    there is no second, independent app to build. Later calls return the same
+    app untouched. Nothing here connects to the database unless
+    DB_CREATE_TABLES is on; tables are otherwise created by init-db.
+    
+    Returns:
+        Flask: the module-level app
+    """
+    if 'sqlalchemy' in app.extensions:
+        return app
+    
+    started = time.perf_counter()
+    db.init_app(app)
+    bcrypt.init_app(app)
+    login_manager.init_app(app)
+    # Found by gunicorn's post_worker_init hook, which calibrates it
+    app.extensions['password_hasher'] = password_hasher
+    
+    engine_options = app.config['SQLALCHEMY_ENGINE_OPTIONS']
+    if engine_options.get('pool_size'):
+        print(f"✅ Database pool: {engine_options['pool_size']} + {engine_options['max_overflow']} overflow per worker")
+    with app.app_context():
+        watch_pool_usage(db.engine)
+        if DATABASE_URL.startswith('sqlite'):
+            configure_sqlite_engine(db.engine)
+            print(f"✅ SQLite WAL mode, busy timeout {SQLITE_BUSY_TIMEOUT_MS}ms")
+        if app.config['DB_CREATE_TABLES']:
+            try:
+                db.create_all()
+            except Exception as e:
+                print(f"❌ Error creating database tables: {str(e)}")
+    print(f"✅ App ready in {(time.perf_counter() - started) * 1000:.0f}ms")
+    return app
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create missing tables, run once per database instead of on every startup"""
+    print(f"{'✅' if app.config['SENDGRID_API_KEY'] else '⚠️'} SendGrid configured: {bool(app.config['SENDGRID_API_KEY'])}")
+    print(f"{'✅' if app.config['CLOUDINARY_CLOUD_NAME'] else '⚠️'} Cloudinary configured: {bool(app.config['CLOUDINARY_CLOUD_NAME'])}")
+    db.create_all()
+    print("✅ Database tables initialized successfully!")
+
+
+@app.cli.command('import-profile')
+@click.option('--top', default=15, help='How many of the slowest imports to list')
+@click.option('--budget-ms', default=None, type=int, help='Exit with status 1 if importing the app takes longer')
+def import_profile_command(top, budget_ms):
+    """Import the app in a fresh interpreter and report where the cold start time goes"""
+    import subprocess
+    import sys
+    
+    started = time.perf_counter()
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import index'],
+        cwd=app.root_path, capture_output=True, text=True
+    )
+    wall_ms = (time.perf_counter() - started) * 1000
+    if result.returncode != 0:
+        print(result.stderr[-2000:])
+        raise SystemExit(1)
+    
+    # Lines look like "import time:  self [us] | cumulative | imported package"
+    imports = []
+    for line in result.stderr.splitlines():
+        parts = line.removeprefix('import time:').split('|')
+        if len(parts) == 3 and parts[0].strip().isdigit():
+            imports.append((int(parts[1]), int(parts[0]), parts[2].rstrip()))
+    index_self_us = next((own for cumulative, own, name in imports if name.strip() == 'index'), 0)
+    # One level below index: the modules index.py imports itself
+    direct = [entry for entry in imports if len(entry[2]) - len(entry[2].lstrip()) == 3]
+    
+    print(f"Cold start: {wall_ms:.0f}ms wall, {index_self_us / 1000:.0f}ms running index.py itself")
+    print("Slowest imports made by index.py:")
+    for cumulative, own, name in sorted(direct, reverse=True)[:top]:
+        print(f"  {cumulative / 1000:7.1f}ms  {name.strip()}")
+    
+    if budget_ms and wall_ms > budget_ms:
+        print(f"❌ Cold start over budget ({wall_ms:.0f}ms > {budget_ms}ms)")
+        raise SystemExit(1)
+
+
+# Synthetic data
+# flask generate-data fills an empty database with coherent fake data for every
+# model, shaped by the distributions given on the command line, so queries and
+# pages can be measured at 10x and 100x production size. Rows go in with one
+# executemany INSERT per batch; about 40,000 users make a million rows.
+SYNTHETIC_PASSWORD = 'loadtest1'  # SigninForm accepts 4 to 10 characters
+SYNTHETIC_FIRST_NAMES = ['Aline', 'Eric', 'Grace', 'Jean', 'Claudine', 'Patrick', 'Diane', 'Olivier', 'Sandrine', 'Emmanuel']
+SYNTHETIC_LAST_NAMES = ['Uwase', 'Habimana', 'Mugisha', 'Niyonzima', 'Ingabire', 'Nshimiyimana', 'Mukamana', 'Ndayisaba']
+
+
+class Distribution:
+    """
+    A whole-number distribution written as on the command line:
+    '5' is always 5, '2-8' is uniform from 2 to 8, 'poisson:12' clusters around 12
+    and 'exp:20' is mostly small with a long tail, about 20 on average
+    """
+
+    def __init__(self, spec):
+        self.spec = spec
+        kind, _, argument = spec.partition(':')
+        try:
+            if argument:
+                if kind not in ('poisson', 'exp'):
+                    raise ValueError
+                self.kind, self.mean = kind, float(argument)
+                valid = self.mean >= 0
+            else:
+                low, _, high = spec.partition('-')
+                self.kind, self.low, self.high = 'uniform', int(low), int(high or low)
+                valid = 0 <= self.low <= self.high
+        except ValueError:
+            valid = False
+        if not valid:
+            raise ValueError(f"'{spec}' is not N, LOW-HIGH, poisson:MEAN or exp:MEAN")
+
+    def sample(self, rng):
+        if self.kind == 'uniform':
+            return rng.randint(self.low, self.high)
+        if self.kind == 'exp':
+            return int(rng.expovariate(1 / self.mean)) if self.mean else 0
+        # Knuth's method loops about mean times; past 30 the normal approximation is close enough
+        if self.mean > 30:
+            return max(0, round(rng.gauss(self.mean, math.sqrt(self.mean))))
+        limit, count, product = math.exp(-self.mean), 0, rng.random()
+        while product > limit:
+            count += 1
+            product *= rng.random()
+        return count
+
+    def __repr__(self):
+        return self.spec
+
+
+class BulkWriter:
+    """Buffers rows per model and inserts them batch_size at a time in one executemany"""
+
+    def __init__(self, conn, batch_size):
+        self.conn = conn
+        self.batch_size = batch_size
+        self.pending = {}
+        self.counts = {}
+        self.written = 0
+
+    def add(self, model, row):
+        rows = self.pending.setdefault(model, [])
+        rows.append(row)
+        if len(rows) >= self.batch_size:
+            self.flush(model)
+
+    def flush(self, model=None):
+        for flushed in [model] if model else list(self.pending):
+            rows = self.pending.pop(flushed, [])
+            if not rows:
+                continue
+            self.conn.execute(db.insert(flushed.__table__), rows)
+            self.counts[flushed.__tablename__] = self.counts.get(flushed.__tablename__, 0) + len(rows)
+            if (self.written + len(rows)) // 100000 > self.written // 100000:
+                print(f"   ... {self.written + len(rows):,} rows")
+            self.written += len(rows)
+
+    def ids(self, model):
+        """Flush pending rows of model and return the ids the database gave them"""
+        self.flush(model)
+        return [row[0] for row in self.conn.execute(db.select(model.id).order_by(model.id))]
+
+
+def generate_synthetic_data(engine, users, seed=1, courses=8, modules_per_course=Distribution('4-10'),
+                            enrollments_per_user=Distribution('0-3'), messages_per_user=Distribution('exp:15'),
+                            applications_per_user=Distribution('0-1'), opportunities=20, events=60,
+                            blog_posts=40, activity_updates=100, leaderboard=100, days=365,
+                            bcrypt_rounds=12, batch_size=5000):
+    """
+    Fill the tables of an empty database with repeatable fake data
+    
+    Users sign up over the last `days` days, in id order like real sign ups.
+    Everything a user owns (enrollments with per-module progress, messages,
+    applications) comes after their sign up, and counts per user are drawn
+    from the given distributions.
+    
+    Args:
+        engine: SQLAlchemy engine of a database whose tables are empty
+        users: number of users to create
+        seed: random seed, the same seed and options give the same data
+        bcrypt_rounds: cost of the password hash every user shares
+        batch_size: rows per INSERT
+    
+    Returns:
+        dict: rows written per table under 'counts', plus what load tests
+        pick from: verified users' 'emails', all 'user_ids', 'modules'
+        (course id -> module ids) and open 'opportunities'
+    """
+    rng = random.Random(seed)
+    now = datetime.utcnow()
+    
+    def before_now(max_days):
+        return now - timedelta(seconds=rng.randint(0, int(max_days * 86400)))
+    
+    # One hash for everyone, hashing per user would take longer than the inserts
+    password_hash = bcrypt.generate_password_hash(SYNTHETIC_PASSWORD, rounds=bcrypt_rounds).decode('utf-8')
+    
+    with engine.begin() as conn:
+        writer = BulkWriter(conn, batch_size)
+        
+        for n in range(1, courses + 1):
+            module_count = max(1, modules_per_course.sample(rng))
+            writer.add(Course, dict(
+                title=f'Entrepreneurship Track {n}', description='How to start and grow a business. ' * 10,
+                duration_weeks=module_count, level=rng.choice(['Beginner', 'Intermediate', 'Advanced']),
+                total_modules=module_count
+            ))
+        writer.flush(Course)
+        for course_id, module_count in conn.execute(db.select(Course.id, Course.total_modules).order_by(Course.id)).all():
+            for number in range(1, module_count + 1):
+                writer.add(CourseModule, dict(
+                    course_id=course_id, module_number=number, title=f'Module {number}',
+                    description='What this module covers. ' * 5, content='Lesson text. ' * rng.randint(100, 600),
+                    duration_days=7, created_at=before_now(days)
+                ))
+        writer.flush(CourseModule)
+        modules = {}
+        for module_id, course_id in conn.execute(db.select(CourseModule.id, CourseModule.course_id).order_by(CourseModule.id)):
+            modules.setdefault(course_id, []).append(module_id)
+        
+        is_open = []
+        for n in range(1, opportunities + 1):
+            # One in four opportunities is still open, the rest closed some time ago
+            is_open.append(n % 4 == 1)
+            deadline = now + timedelta(days=rng.randint(7, 60) if is_open[-1] else -rng.randint(1, days))
+            writer.add(ApplicationOpportunity, dict(
+                title=f'Business Competition {n}', description='Pitch your business idea. ' * 10,
+                requirements='Be between 18 and 35 and live in Rwanda.', deadline=deadline,
+                prize_amount=f'{rng.choice([500, 1000, 2000, 5000])},000 RWF',
+                status='open' if is_open[-1] else 'closed', created_at=deadline - timedelta(days=60)
+            ))
+        opportunity_ids = writer.ids(ApplicationOpportunity)
+        for n in range(1, events + 1):
+            writer.add(Event, dict(
+                title=f'Event {n}', description='Workshop or deadline. ' * 5, start_time='09:00', end_time='12:00',
+                event_date=now + timedelta(days=rng.randint(-days // 2, days // 2)),
+                event_type=rng.choice(['general', 'workshop', 'deadline']), is_active=rng.random() < 0.9
+            ))
+        for n in range(1, blog_posts + 1):
+            writer.add(BlogPost, dict(
+                title=f'Story {n}', author=rng.choice(SYNTHETIC_FIRST_NAMES), description='A founder story. ' * 10,
+                youtube_url='https://www.youtube.com/watch?v=synthetic', cover_image=f'{rng.randint(1, 5)}.jpg',
+                publish_date=before_now(days), is_published=rng.random() < 0.9
+            ))
+        for n in range(1, activity_updates + 1):
+            writer.add(ActivityUpdate, dict(
+                title=f'Update {n}', description='Something happened. ' * 5, created_at=before_now(days),
+                update_type=rng.choice(['general', 'success', 'warning', 'info']),
+                icon_color=rng.choice(['green', 'blue', 'yellow', 'purple', 'red']), is_active=rng.random() < 0.9
+            ))
+        
+        signed_up = sorted(before_now(days) for _ in range(users))
+        verified_emails = []
+        for n, created_at in enumerate(signed_up):
+            email, verified = f'user{n}@synthetic.test', rng.random() < 0.9
+            writer.add(TYI, dict(
+                firstname=rng.choice(SYNTHETIC_FIRST_NAMES), lastname=rng.choice(SYNTHETIC_LAST_NAMES),
+                email=email, password=password_hash, created_at=created_at, email_verified=verified
+            ))
+            if verified:
+                verified_emails.append(email)
+        user_ids = writer.ids(TYI)
+        
+        course_ids = list(modules)
+        for user_id, created_at in zip(user_ids, signed_up):
+            active_days = (now - created_at).total_seconds() / 86400
+            
+            for course_id in rng.sample(course_ids, min(enrollments_per_user.sample(rng), len(course_ids))):
+                course_modules = modules[course_id]
+                completed = rng.randint(0, len(course_modules))
+                enrolled_at = created_at + timedelta(days=rng.uniform(0, active_days))
+                finished = completed == len(course_modules)
+                writer.add(UserCourse, dict(
+                    user_id=user_id, course_id=course_id, current_module=min(completed + 1, len(course_modules)),
+                    completed_modules=completed, progress_percentage=completed * 100 // len(course_modules),
+                    status='completed' if finished else 'in_progress', enrolled_at=enrolled_at,
+                    completed_at=now if finished else None
+                ))
+                for number, module_id in enumerate(course_modules):
+                    status = 'completed' if number < completed else ('in_progress' if number == completed else 'not_started')
+                    writer.add(UserModuleProgress, dict(
+                        user_id=user_id, module_id=module_id, status=status,
+                        started_at=enrolled_at if status != 'not_started' else None,
+                        completed_at=now if status == 'completed' else None
+                    ))
+            
+            for n in range(messages_per_user.sample(rng)):
+                writer.add(Message, dict(
+                    user_id=user_id, title=f'Notice {n + 1}', content='A message from the Tegura team. ' * 3,
+                    message_type=rng.choice(['blue', 'green', 'yellow', 'red']),
+                    icon_type=rng.choice(['general', 'application', 'course', 'achievement']),
+                    is_read=rng.random() < 0.7, created_at=created_at + timedelta(days=rng.uniform(0, active_days))
+                ))
+            
+            for opportunity_id in rng.sample(opportunity_ids, min(applications_per_user.sample(rng), len(opportunity_ids))):
+                applied_at = created_at + timedelta(days=rng.uniform(0, active_days))
+                status = rng.choice(['draft', 'submitted', 'submitted', 'under_review', 'approved', 'rejected'])
+                writer.add(Application, dict(
+                    user_id=user_id, opportunity_id=opportunity_id, competition_name=f'Business Competition {opportunity_id}',
+                    business_name=f'{rng.choice(SYNTHETIC_LAST_NAMES)} Ventures', business_idea='A business idea. ' * 20,
+                    status=status, completion_percentage=25 if status == 'draft' else 100, created_at=applied_at,
+                    submitted_at=applied_at if status != 'draft' else None,
+                    reviewed_at=now if status in ('approved', 'rejected') else None
+                ))
+        
+        for rank, user_id in enumerate(sorted(rng.sample(user_ids, min(leaderboard, len(user_ids)))), start=1):
+            writer.add(LeaderboardEntry, dict(
+                user_id=user_id, rank=rank, total_points=max(0, 10000 - 37 * rank + rng.randint(0, 30)),
+                project_name=f'{rng.choice(SYNTHETIC_LAST_NAMES)} Ventures', location=rng.choice(['Kigali', 'Huye', 'Musanze', 'Rubavu'])
+            ))
+        writer.flush()
+    
+    return {
+        'counts': writer.counts,
+        'emails': verified_emails,
+        'user_ids': user_ids,
+        'modules': modules,
+        'opportunities': [opportunity_id for opportunity_id, open_ in zip(opportunity_ids, is_open) if open_]
+    }
+
+
+def distribution_option(ctx, param, value):
+    try:
+        return Distribution(value)
+    except ValueError as e:
+        raise click.BadParameter(str(e))
+
+
+@app.cli.command('generate-data')
+@click.option('--users', default=1000, help='Users to create; about 40,000 make a million rows with the defaults')
+@click.option('--database-url', default=None, help='Database to fill, defaults to the app database; its tables must be empty')
+@click.option('--seed', default=1, help='Random seed, the same seed and options give the same data')
+@click.option('--courses', default=8, help='Courses')
+@click.option('--modules-per-course', default='4-10', callback=distribution_option, help='Distribution of modules per course')
+@click.option('--enrollments-per-user', default='0-3', callback=distribution_option, help='Distribution of courses each user enrolls in')
+@click.option('--messages-per-user', default='exp:15', callback=distribution_option, help='Distribution of inbox messages per user')
+@click.option('--applications-per-user', default='0-1', callback=distribution_option, help='Distribution of applications per user')
+@click.option('--opportunities', default=20, help='Application opportunities, one in four still open')
+@click.option('--events', default=60, help='Calendar events')
+@click.option('--blog-posts', default=40, help='Blog posts')
+@click.option('--activity-updates', default=100, help='Activity feed updates')
+@click.option('--leaderboard', default=100, help='Users on the leaderboard')
+@click.option('--days', default=365, help='How far back sign ups and activity go')
+@click.option('--batch-size', default=5000, help='Rows per INSERT')
+@click.option('--bcrypt-rounds', default=12, help='Cost of the password hash shared by every user')
+def generate_data_command(database_url, users, **options):
+    """Fill an empty database with synthetic users, courses, progress, messages and applications"""
+    from sqlalchemy import create_engine
+    
+    engine = create_engine(database_url or app.config['SQLALCHEMY_DATABASE_URI'])
+    db.metadata.create_all(engine)
+    models = [TYI, Course, CourseModule, UserCourse, UserModuleProgress, Application,
+              ApplicationOpportunity, Message, LeaderboardEntry, Event, BlogPost, ActivityUpdate]
+    with engine.connect() as conn:
+        filled = [model.__tablename__ for model in models
+                  if conn.execute(db.select(db.func.count()).select_from(model.__table__)).scalar()]
+    if filled:
+        print(f"❌ These tables already have rows: {', '.join(filled)}. Use an empty database.")
+        raise SystemExit(1)
+    
+    print(f"⏳ Generating data for {users:,} users into {engine.url.render_as_string(hide_password=True)}")
+    started = time.perf_counter()
+    result = generate_synthetic_data(engine, users, **options)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    
+    for table, count in sorted(result['counts'].items(), key=lambda item: -item[1]):
+        print(f"   {table:<24} {count:>12,}")
+    total = sum(result['counts'].values())
+    print(f"✅ {total:,} rows in {elapsed:.1f}s ({total / elapsed:,.0f} rows/s)")
+    print(f"   Sign in as user0@synthetic.test (or any userN) with password {SYNTHETIC_PASSWORD}")
+
+
+# Load testing
+# flask load-test seeds a throwaway database, starts the app under gunicorn
+# next to the SendGrid and Cloudinary mocks, and walks simulated users through
+# the main journeys. Latency percentiles and throughput per route are printed
+# and saved as JSON under loadtest-results/ so runs can be compared across commits.
+
+
+class LoadTestResults:
+    """Latency samples and failures per route, shared by all simulated users"""
+
+    def __init__(self, record_from, record_until):
+        self.record_from = record_from
+        self.record_until = record_until
+        self.samples = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, route, seconds, ok):
+        # Warm-up traffic and requests finishing after the run are left out
+        if not self.record_from <= time.monotonic() <= self.record_until:
+            return
+        with self._lock:
+            self.samples.setdefault(route, []).append(seconds)
+            if not ok:
+                self.errors[route] = self.errors.get(route, 0) + 1
+
+    def summary(self):
+        """Per-route request and error counts, throughput and p50/p95/p99/max in milliseconds"""
+        measured = self.record_until - self.record_from
+        routes = {}
+        for route, samples in sorted(self.samples.items()):
+            ordered = sorted(samples)
+            routes[route] = {
+                'requests': len(ordered),
+                'errors': self.errors.get(route, 0),
+                'throughput_rps': round(len(ordered) / measured, 2),
+                'p50_ms': round(percentile(ordered, 50) * 1000, 1),
+                'p95_ms': round(percentile(ordered, 95) * 1000, 1),
+                'p99_ms': round(percentile(ordered, 99) * 1000, 1),
+                'max_ms': round(ordered[-1] * 1000, 1)
+            }
+        return routes
+
+
+class LoadTestClient:
+    """One simulated browser: its own cookies, redirects not followed, every request timed"""
+
+    def __init__(self, base_url, results, think_seconds=0.0):
+        import http.cookiejar
+        import urllib.request
+
+        class NoRedirect(urllib.request.HTTPRedirectHandler):
+            def redirect_request(self, *args, **kwargs):
+                return None
+
+        self.base_url = base_url
+        self.results = results
+        self.think_seconds = think_seconds
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()), NoRedirect()
+        )
+
+    def request(self, route, path, data=None):
+        """GET path, or POST data to it, and record the time under 'METHOD route'"""
+        import urllib.error
+        import urllib.parse
+
+        body = urllib.parse.urlencode(data).encode() if data is not None else None
+        started = time.perf_counter()
+        try:
+            with self.opener.open(self.base_url + path, data=body, timeout=60) as response:
+                status, content = response.status, response.read()
+        except urllib.error.HTTPError as e:
+            status, content = e.code, e.read()
+        except OSError:
+            status, content = 0, b''
+        self.results.record(f"{'POST' if data is not None else 'GET'} {route}", time.perf_counter() - started, 0 < status < 400)
+        
+        if self.think_seconds:
+            time.sleep(self.think_seconds)
+        return status, content
+
+    def csrf_token(self):
+        status, content = self.request('/csrf-token', '/csrf-token')
+        return json.loads(content)['csrf_token'] if status == 200 else ''
+
+
+def run_member_journey(client, plan, rng, deadline, engine, number):
+    """Visit the site until the deadline: sign up or sign in, enroll, browse the member pages, log out"""
+    # Every visit signs in again so the auth routes are measured like any
+    # other page, not only once during warm-up. Half the simulated users
+    # register and verify a new account each visit, the rest sign in as
+    # seeded users who already have courses and messages.
+    while time.monotonic() < deadline:
+        if number % 2 == 0:
+            email = f'vu{number}-{uuid.uuid4().hex[:8]}@loadtest.local'
+            client.request('/register', '/register')
+            client.request('/register', '/register', {
+                'csrf_token': client.csrf_token(), 'firstname': 'Load', 'lastname': 'Tester',
+                'email': email, 'password': SYNTHETIC_PASSWORD
+            })
+            with engine.connect() as conn:
+                token = conn.execute(db.select(TYI.verification_token).filter_by(email=email)).scalar()
+            client.request('/verify-email/<token>', f'/verify-email/{token}')
+        else:
+            email = rng.choice(plan['emails'])
+        client.request('/login', '/login')
+        client.request('/login', '/login', {'csrf_token': client.csrf_token(), 'email': email, 'password': SYNTHETIC_PASSWORD})
+        
+        course_id = rng.choice(list(plan['modules']))
+        client.request('/course/enroll/<course_id>', f'/course/enroll/{course_id}', {})
+        client.request('/home', '/home')
+        client.request('/home/education', '/home/education')
+        client.request('/course/<course_id>', f'/course/{course_id}')
+        module_id = rng.choice(plan['modules'][course_id])
+        client.request('/course/<course_id>/module/<module_id>', f'/course/{course_id}/module/{module_id}')
+        client.request('/home/messages', '/home/messages')
+        client.request('/home/leaderboard', '/home/leaderboard')
+        client.request('/opportunities', '/opportunities')
+        opportunity_id = rng.choice(plan['opportunities'])
+        client.request('/opportunity/<opp_id>/apply', f'/opportunity/{opportunity_id}/apply')
+        client.request('/opportunity/<opp_id>/apply', f'/opportunity/{opportunity_id}/apply', {
+            'business_name': 'Load test business', 'business_idea': 'A simulated application'
+        })
+        client.request('/logout', '/logout')
+
+
+def run_admin_journey(client, plan, rng, deadline):
+    """Sign in as admin, go through the admin pages and log out, until the deadline"""
+    while time.monotonic() < deadline:
+        client.request('/admin/login', '/admin/login', {'password': ADMIN_PASSWORD})
+        client.request('/admin', '/admin')
+        client.request('/admin/progress', '/admin/progress')
+        client.request('/admin/progress/user/<user_id>', f"/admin/progress/user/{rng.choice(plan['user_ids'])}")
+        client.request('/admin/applications', '/admin/applications')
+        client.request('/admin/leaderboard', '/admin/leaderboard')
+        client.request('/admin/logout', '/admin/logout')
+
+
+def wait_for_server(base_url, process, log_path, timeout=60):
+    """Block until the app answers, or exit with its log if it died or never came up"""
+    import urllib.request
+
+    give_up = time.monotonic() + timeout
+    while time.monotonic() < give_up:
+        if process.poll() is not None:
+            break
+        try:
+            urllib.request.urlopen(base_url + '/login', timeout=2).close()
+            return
+        except OSError:
+            time.sleep(0.2)
+    with open(log_path) as f:
+        print(f.read()[-3000:])
+    print("❌ The app did not start")
+    raise SystemExit(1)
+
+
+@app.cli.command('load-test')
+@click.option('--users', default=10, help='Simulated users running at once; one of them uses the admin pages')
+@click.option('--duration', default=30, help='Seconds to measure for')
+@click.option('--warmup', default=5, help='Seconds of traffic before measuring starts')
+@click.option('--seed-users', default=500, help='Registered users to seed the database with')
+@click.option('--seed', default=1, help='Random seed for the data and the journeys')
+@click.option('--database-url', default=None, help='Empty SQLite or local Postgres database, defaults to a temporary SQLite file')
+@click.option('--workers', default=2, help='Gunicorn workers')
+@click.option('--port', default=8090, help='Port for the app; the SendGrid and Cloudinary mocks use the next two')
+@click.option('--bcrypt-rounds', default=10, help='Fixed bcrypt cost, so runs on different machines compare')
+@click.option('--think-ms', default=0, help='Pause after each request, 0 sends requests back to back')
+@click.option('--output', default=None, help='Results file, defaults to loadtest-results/<time>-<commit>.json')
+@click.option('--baseline', default=None, type=click.Path(exists=True), help='Earlier results file to compare p95 latency with')
+def load_test_command(users, duration, warmup, seed_users, seed, database_url, workers, port,
+                      bcrypt_rounds, think_ms, output, baseline):
+    """Seed a database, start the app with mocked SendGrid and Cloudinary, and measure the main user journeys"""
+    import shutil
+    import subprocess
+    import sys
+    from sqlalchemy import create_engine, inspect
+    
+    root = os.path.dirname(app.root_path)
+    workdir = tempfile.mkdtemp(prefix='tegura-loadtest-')
+    database_url = database_url or f"sqlite:///{os.path.join(workdir, 'loadtest.db')}"
+    engine = create_engine(database_url)
+    if inspect(engine).get_table_names():
+        print("❌ The load test database must be empty, it gets filled with seed data")
+        raise SystemExit(1)
+    db.metadata.create_all(engine)
+    plan = generate_synthetic_data(engine, seed_users, seed=seed, bcrypt_rounds=bcrypt_rounds)
+    print(f"✅ Seeded {sum(plan['counts'].values()):,} rows into {engine.url.render_as_string(hide_password=True)}")
+    
+    env = dict(
+        os.environ,
+        DATABASE_URL=database_url,
+        EMAIL_TRANSPORT='sendgrid',
+        SENDGRID_API_KEY='SG.loadtest',
+        SENDGRID_FROM_EMAIL='loadtest@loadtest.local',
+        SENDGRID_API_HOST=f'http://127.0.0.1:{port + 1}',
+        CLOUDINARY_CLOUD_NAME='loadtest',
+        CLOUDINARY_API_KEY='loadtest',
+        CLOUDINARY_API_SECRET='loadtest',
+        CLOUDINARY_UPLOAD_PREFIX=f'http://127.0.0.1:{port + 2}',
+        BCRYPT_LOG_ROUNDS=str(bcrypt_rounds),
+        REQUEST_LOG='0',
+        WEB_CONCURRENCY=str(workers),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(workdir, 'metrics')
+    )
+    log_path = os.path.join(workdir, 'server.log')
+    log = open(log_path, 'w')
+    flask_command = [sys.executable, '-m', 'flask', '--app', 'index.py']
+    processes = [
+        subprocess.Popen(flask_command + ['sendgrid-mock', '--port', str(port + 1)],
+                         cwd=app.root_path, env=env, stdout=log, stderr=subprocess.STDOUT),
+        subprocess.Popen(flask_command + ['cloudinary-mock', '--port', str(port + 2)],
+                         cwd=app.root_path, env=env, stdout=log, stderr=subprocess.STDOUT),
+        subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', os.path.join(root, 'gunicorn.conf.py'),
+                          '--chdir', app.root_path, '-b', f'127.0.0.1:{port}', 'index:app'],
+                         cwd=root, env=env, stdout=log, stderr=subprocess.STDOUT)
+    ]
+    base_url = f'http://127.0.0.1:{port}'
+    started_at = datetime.now(KIGALI_TZ)
+    try:
+        wait_for_server(base_url, processes[-1], log_path)
+        print(f"🚀 {users} simulated users for {warmup}s warm-up + {duration}s against {base_url}")
+        
+        start = time.monotonic()
+        results = LoadTestResults(start + warmup, start + warmup + duration)
+        rng = random.Random(seed)
+        threads = []
+        for number in range(users):
+            client = LoadTestClient(base_url, results, think_ms / 1000)
+            journey_rng = random.Random(rng.random())
+            if number == 0 and users > 1:
+                args = (run_admin_journey, client, plan, journey_rng, results.record_until)
+            else:
+                args = (run_member_journey, client, plan, journey_rng, results.record_until, engine, number)
+            threads.append(threading.Thread(target=args[0], args=args[1:], daemon=True))
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=30)
+        log.close()
+        engine.dispose()
+    
+    routes = results.summary()
+    total_requests = sum(route['requests'] for route in routes.values())
+    total_errors = sum(route['errors'] for route in routes.values())
+    
+    def git(*args):
+        return subprocess.run(['git', *args], cwd=root, capture_output=True, text=True).stdout.strip()
+    
+    commit = git('rev-parse', '--short', 'HEAD') or 'unknown'
+    report = {
+        'commit': commit,
+        'dirty': bool(git('status', '--porcelain', '--untracked-files=no')),
+        'started_at': started_at.isoformat(timespec='seconds'),
+        'database': engine.dialect.name,
+        'config': {
+            'users': users, 'duration_s': duration, 'warmup_s': warmup, 'seed_users': seed_users,
+            'seed': seed, 'workers': workers, 'bcrypt_rounds': bcrypt_rounds, 'think_ms': think_ms
+        },
+        'requests': total_requests,
+        'errors': total_errors,
+        'throughput_rps': round(total_requests / duration, 2),
+        'routes': routes
+    }
+    
+    previous = {}
+    if baseline:
+        with open(baseline) as f:
+            previous = json.load(f)['routes']
+    print(f"\n{'route':<48} {'reqs':>6} {'err':>4} {'p50':>8} {'p95':>8} {'p99':>8} {'req/s':>7}" + ('  p95 vs baseline' if previous else ''))
+    for route, stats in routes.items():
+        line = (f"{route:<48} {stats['requests']:>6} {stats['errors']:>4} {stats['p50_ms']:>7.1f}ms "
+                f"{stats['p95_ms']:>6.1f}ms {stats['p99_ms']:>6.1f}ms {stats['throughput_rps']:>7.1f}")
+        if route in previous and previous[route]['p95_ms']:
+            change = (stats['p95_ms'] - previous[route]['p95_ms']) / previous[route]['p95_ms'] * 100
+            line += f"  {change:+.0f}%"
+        print(line)
+    print(f"\nTotal: {total_requests} requests, {report['throughput_rps']} req/s, {total_errors} errors")
+    
+    output = output or os.path.join(root, 'loadtest-results', f"{started_at:%Y%m%d-%H%M%S}-{commit}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"✅ Results saved to {output}")
+    
+    if total_errors:
+        print(f"⚠️ Some requests failed, the app's log is in {log_path}")
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+app = configure_app()
 
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
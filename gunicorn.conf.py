@@ -0,0 +1,32 @@
+# Gunicorn settings, read from the same environment variables the app uses to
+# size its database pool (see database_engine_options in api/index.py).
+import os
+import shutil
+import tempfile
+
+workers = int(os.environ.get('WEB_CONCURRENCY', 2))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+worker_class = 'gthread' if threads > 1 else 'sync'
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+
+# Prometheus: each worker writes its metrics under this directory and /metrics
+# adds them up. Emptied at startup so the last run's counters are not included.
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', os.path.join(tempfile.gettempdir(), 'tegura-metrics'))
+
+
+def on_starting(server):
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def post_worker_init(worker):
+    # Calibrate the bcrypt cost before this worker takes requests, not inside its first login
+    hasher = worker.wsgi.extensions.get('password_hasher')
+    if hasher is not None:
+        hasher.prepare()
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)